@@ -440,7 +440,7 @@ class CatalogVisualizerDialog(QDialog):
     - 右侧：事件详细信息表格
     """
     
-    def __init__(self, parent=None, events_df=None, stations_df=None, associator=None):
+    def __init__(self, parent=None, events_df=None, stations_df=None, associator=None, figure=None):
         """初始化可视化对话框
         
         参数:
@@ -448,6 +448,7 @@ class CatalogVisualizerDialog(QDialog):
             events_df: 地震事件数据框
             stations_df: 台站信息数据框  
             associator: 地震关联器对象
+            figure: 由调用方持有、可重复使用的Figure对象（可选，不提供时新建）
         """
         super().__init__(parent)
         
@@ -455,6 +456,7 @@ class CatalogVisualizerDialog(QDialog):
         self.events_df = events_df
         self.stations_df = stations_df
         self.associator = associator
+        self._shared_figure = figure
         
         # 设置窗口属性
         self.setWindowTitle("地震事件可视化")
@@ -514,8 +516,8 @@ class CatalogVisualizerDialog(QDialog):
         map_layout = QVBoxLayout(map_widget)
         map_layout.setContentsMargins(0, 0, 0, 0)  # 移除内边距
         
-        # 创建自适应窗口大小的Matplotlib图形
-        self.figure = Figure()  # 不指定大小，将根据容器自动调整
+        # 创建自适应窗口大小的Matplotlib图形，调用方提供图形时直接复用（绘图前会清空）
+        self.figure = self._shared_figure if self._shared_figure is not None else Figure()  # 不指定大小，将根据容器自动调整
         self.canvas = FigureCanvas(self.figure)  # 创建画布
         # 设置画布的大小策略为Expanding，使其填充可用空间
         self.canvas.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
@@ -945,7 +947,7 @@ class CatalogVisualizer:
     """
     
     @staticmethod
-    def show_catalog_visualization(parent, events_df, stations_df=None, associator=None):
+    def show_catalog_visualization(parent, events_df, stations_df=None, associator=None, figure=None):
         """显示地震目录可视化对话框
         
         参数:
@@ -953,6 +955,7 @@ class CatalogVisualizer:
             events_df: 地震事件数据框
             stations_df: 台站信息数据框（可选）
             associator: 地震关联器对象（可选）
+            figure: 多次打开对话框时复用的Figure对象（可选）
             
         返回:
             None
@@ -967,7 +970,8 @@ class CatalogVisualizer:
             parent=parent,
             events_df=events_df,
             stations_df=stations_df,
-            associator=associator
+            associator=associator,
+            figure=figure
         )
         
         # 显示对话框 - 这是一个模态对话框，会阻塞直到关闭
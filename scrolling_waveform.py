@@ -32,7 +32,13 @@ class ScrollingWaveformDisplay(QWidget):
         self.auto_scale_y = False  # 默认不自动缩放Y轴，保持与原图像一致
         self.is_streaming = False  # 是否正在模拟流
         self.speed_factor = 1.0  # 播放速度
-        self.picks = []  # 存储相位检测结果
+        self.picks = None  # 存储相位检测结果数据框
+        self._pick_times = {}  # 每个通道按时间排序的相位时间戳数组
+        self._pick_phases = {}  # 与_pick_times对应的相位类型
+        self._pick_probs = {}  # 与_pick_times对应的相位概率
+        self._envelopes = {}  # 每个通道的最小/最大值包络金字塔 [(每段样本数, 交替排列的最小/最大值), ...]
+        self.max_plot_points = 2000  # 每个通道单次绘制的最大点数，窗口内样本更多时改用包络
+        self._subplot_params = {}  # tight_layout计算出的子图边距 {(可见通道数, 图形尺寸): 边距参数}
         
         # 多波形显示相关属性
         self.vertical_offset = 0  # 垂直偏移量，用于控制显示的波形范围
@@ -224,6 +230,9 @@ class ScrollingWaveformDisplay(QWidget):
         # 保存原始流数据
         self.stream = stream
         
+        # 预先按2的幂逐级生成包络，长窗口时直接取合适的层级绘制
+        self._envelopes = {tr.id: self._build_envelopes(tr.data) for tr in stream}
+        
         # 获取流的时间范围和采样率
         self.sampling_rate = stream[0].stats.sampling_rate
         duration = max([tr.stats.endtime - tr.stats.starttime for tr in stream])
@@ -272,6 +281,26 @@ class ScrollingWaveformDisplay(QWidget):
         # 初始化图形显示
         self.init_plot()
         
+    def _build_envelopes(self, data):
+        """从每4个样本一段开始逐级合并相邻两段，生成最小/最大值包络，点数少于max_plot_points时停止"""
+        levels = []
+        factor = 4
+        mins = maxs = None
+        while len(data) // factor * 2 >= self.max_plot_points:
+            if mins is None:
+                blocks = data[:len(data) // factor * factor].reshape(-1, factor)
+                mins, maxs = blocks.min(axis=1), blocks.max(axis=1)
+            else:
+                used = len(mins) // 2 * 2
+                mins = np.minimum(mins[0:used:2], mins[1:used:2])
+                maxs = np.maximum(maxs[0:used:2], maxs[1:used:2])
+            envelope = np.empty(2 * len(mins), dtype=data.dtype)
+            envelope[0::2] = mins
+            envelope[1::2] = maxs
+            levels.append((factor, envelope))
+            factor *= 2
+        return levels
+    
     def init_plot(self):
         """初始化绘图"""
         if not self.stream:
@@ -347,13 +376,22 @@ class ScrollingWaveformDisplay(QWidget):
                 title = f"地震波形监测 - {start_time_str} (共{total_channels}个通道)"
             self.figure.suptitle(title, fontsize=11, y=0.98)
         
-        # 使用智能布局，根据可见通道数调整间距
-        if num_visible <= 4:
-            # 少量通道时，使用较大的间距
-            self.figure.tight_layout(pad=1.5, rect=[0.02, 0.03, 0.98, 0.95])
+        # 使用智能布局，根据可见通道数调整间距；垂直滚动等重建子图时，
+        # 相同通道数和图形尺寸直接套用缓存的边距，不再重新计算
+        layout_key = (num_visible, tuple(self.figure.get_size_inches()))
+        params = self._subplot_params.get(layout_key)
+        if params is not None:
+            self.figure.subplots_adjust(**params)
         else:
-            # 多通道时，使用较小的间距以节省空间
-            self.figure.tight_layout(pad=0.8, rect=[0.02, 0.03, 0.98, 0.95])
+            if num_visible <= 4:
+                # 少量通道时，使用较大的间距
+                self.figure.tight_layout(pad=1.5, rect=[0.02, 0.03, 0.98, 0.95])
+            else:
+                # 多通道时，使用较小的间距以节省空间
+                self.figure.tight_layout(pad=0.8, rect=[0.02, 0.03, 0.98, 0.95])
+            pars = self.figure.subplotpars
+            self._subplot_params[layout_key] = dict(left=pars.left, right=pars.right, bottom=pars.bottom,
+                                                    top=pars.top, wspace=pars.wspace, hspace=pars.hspace)
         
         # 强制重绘画布
         self.canvas.draw()
@@ -415,8 +453,12 @@ class ScrollingWaveformDisplay(QWidget):
             if start_sample >= end_sample:
                 continue
             
-            # 获取数据片段
+            # 获取数据片段，窗口内样本过多时取点数仍不少于max_plot_points的最粗包络层级
             data_slice = trace.data[start_sample:end_sample]
+            for factor, envelope in reversed(self._envelopes.get(trace_id, ())):
+                if (end_sample - start_sample) // factor * 2 >= self.max_plot_points:
+                    data_slice = envelope[2 * (start_sample // factor):2 * (end_sample // factor)]
+                    break
             
             # 计算对应的实际时间点 - 相对于波形起始时间的绝对时间
             times = np.linspace(window_start, window_end, len(data_slice))
@@ -489,31 +531,39 @@ class ScrollingWaveformDisplay(QWidget):
                 self.axes[trace_id].set_ylim(y_min - margin, y_max + margin)
             
             # 显示相位检测结果
-            if self.picks:
+            if self._pick_times:
                 # 获取当前通道的相位检测结果
                 channel_id = '.'.join(trace.id.split('.', 2)[:2])  # 提取通道ID
-                channel_picks = [p for p in self.picks if p['channel'] == channel_id]
                 
                 # 清除之前的相位标记
                 for artist in self.axes[trace_id].lines + self.axes[trace_id].texts:
                     if artist != self.lines[trace_id]:  # 保留波形线条
                         artist.remove()
                 
-                # 添加相位标记
-                for pick in channel_picks:
-                    # 计算相位的实际时间位置
-                    pick_actual_time = (pick['time'] - trace.stats.starttime)
+                pick_times = self._pick_times.get(channel_id)
+                if pick_times is not None:
+                    # 二分查找定位当前窗口内的相位，只遍历窗口内的部分
+                    trace_start = trace.stats.starttime.timestamp
+                    lo = np.searchsorted(pick_times, trace_start + window_start, side='left')
+                    hi = np.searchsorted(pick_times, trace_start + window_end, side='right')
                     
-                    # 只显示当前窗口内的相位
-                    if window_start <= pick_actual_time <= window_end:
+                    # 标签位置每个轴只计算一次，循环内仅做算术
+                    y_position = self.axes[trace_id].get_ylim()[1] * 0.8
+                    label_offset = (window_end - window_start) * 0.01
+                    
+                    # 添加相位标记
+                    for k in range(lo, hi):
+                        # 计算相位的实际时间位置
+                        pick_actual_time = pick_times[k] - trace_start
+                        phase = self._pick_phases[channel_id][k]
+                        
                         # 绘制相位线
-                        color = 'red' if pick['phase'] == 'P' else 'blue'
+                        color = 'red' if phase == 'P' else 'blue'
                         self.axes[trace_id].axvline(pick_actual_time, color=color, linestyle='--', alpha=0.7, linewidth=1.5)
                         
                         # 添加相位标签
-                        y_position = self.axes[trace_id].get_ylim()[1] * 0.8
-                        self.axes[trace_id].text(pick_actual_time + (window_end - window_start) * 0.01, y_position,
-                                f"{pick['phase']}\n{pick['probability']:.2f}",
+                        self.axes[trace_id].text(pick_actual_time + label_offset, y_position,
+                                f"{phase}\n{self._pick_probs[channel_id][k]:.2f}",
                                 color=color, va='top', fontsize=8, 
                                 bbox=dict(facecolor='white', alpha=0.7, pad=1))
         
@@ -637,9 +687,21 @@ class ScrollingWaveformDisplay(QWidget):
         """设置相位检测结果
         
         参数:
-        - picks: 相位检测结果列表，每个元素是一个字典，包含time, phase, channel, probability等键
+        - picks: 相位检测结果数据框，包含time（时间戳）, phase, channel, probability列
         """
         self.picks = picks
+        
+        # 按通道分组并按时间排序，update_plot中用二分查找定位窗口内的相位
+        self._pick_times = {}
+        self._pick_phases = {}
+        self._pick_probs = {}
+        if picks is not None:
+            for channel_id, ch_picks in picks.groupby('channel', sort=False):
+                ch_picks = ch_picks.sort_values('time', kind='stable')
+                self._pick_times[channel_id] = ch_picks['time'].to_numpy(dtype=np.float64)
+                self._pick_phases[channel_id] = ch_picks['phase'].to_numpy()
+                self._pick_probs[channel_id] = ch_picks['probability'].to_numpy()
+        
         # 如果当前正在显示波形，则更新图表以显示相位标记
         if self.stream:
             self.update_plot()
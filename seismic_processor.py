@@ -1,104 +1,401 @@
 import numpy as np
-from obspy import read, Stream, UTCDateTime
-import seisbench.models as sbm
-import pyocto
+from scipy.signal import iirfilter, sosfilt, detrend
+from obspy import read, Stream, Trace, UTCDateTime
 import pandas as pd
 from datetime import datetime
 from obspy.core.event import Catalog, Event, Origin, Magnitude, Pick
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import QThread, QObject, QRunnable, pyqtSignal
 import traceback
+import inspect
+import os
+import io
+import mmap
+import contextlib
+import queue
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
-# 波形加载线程类
-class WaveformLoadThread(QThread):
+# 深度学习依赖延迟导入函数
+# torch/seisbench/pyocto导入耗时数秒，推迟到首次加载模型、检测或关联时再导入，
+# 使主窗口尽快显示；lru_cache保证只导入一次
+@lru_cache(maxsize=None)
+def _torch():
+    """首次调用时导入torch"""
+    import torch
+    return torch
+
+@lru_cache(maxsize=None)
+def _sbm():
+    """首次调用时导入seisbench.models"""
+    import seisbench.models as sbm
+    return sbm
+
+@lru_cache(maxsize=None)
+def _pyocto():
+    """首次调用时导入pyocto"""
+    import pyocto
+    return pyocto
+
+# MiniSEED记录布局函数
+def _mseed_layout(head_stream):
+    """根据只读文件头的波形判断文件是否为定长记录的MiniSEED，返回(记录长度, 字节序)，否则返回(None, None)"""
+    layouts = set()
+    for tr in head_stream:
+        if tr.stats.get('_format') != 'MSEED' or 'mseed' not in tr.stats:
+            return None, None
+        layouts.add((tr.stats.mseed.record_length, tr.stats.mseed.byteorder))
+    if len(layouts) != 1:
+        return None, None
+    return layouts.pop()
+
+# MiniSEED记录索引函数
+@lru_cache(maxsize=2)
+def _mseed_record_index(filename, mtime, record_length, byteorder):
+    """通过内存映射一次性解析所有记录的固定头，返回各记录的起止时间(纳秒)，无法解析时返回None"""
+    if os.path.getsize(filename) == 0 or os.path.getsize(filename) % record_length:
+        return None
+    
+    # 按记录长度为步长构造结构化视图，只读取每条记录固定头中的时间、样本数和采样率字段
+    header_dtype = np.dtype({
+        'names': ['quality', 'year', 'day', 'hour', 'minute', 'second', 'frac',
+                  'nsamples', 'rate_factor', 'rate_mult'],
+        'formats': ['S1', byteorder + 'u2', byteorder + 'u2', 'u1', 'u1', 'u1', byteorder + 'u2',
+                    byteorder + 'u2', byteorder + 'i2', byteorder + 'i2'],
+        'offsets': [6, 20, 22, 24, 25, 26, 28, 30, 32, 34],
+        'itemsize': record_length,
+    })
+    with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        headers = np.frombuffer(mm, dtype=header_dtype)
+        valid = (np.isin(headers['quality'], [b'D', b'R', b'Q', b'M']).all()
+                 and ((headers['day'] >= 1) & (headers['day'] <= 366)).all())
+        if valid:
+            days = ((headers['year'].astype(np.int64) - 1970).astype('datetime64[Y]').astype('datetime64[D]')
+                    + (headers['day'].astype(np.int64) - 1))
+            start_ns = (days.astype('datetime64[ns]').astype(np.int64)
+                        + headers['hour'].astype(np.int64) * 3_600_000_000_000
+                        + headers['minute'].astype(np.int64) * 60_000_000_000
+                        + headers['second'].astype(np.int64) * 1_000_000_000
+                        + headers['frac'].astype(np.int64) * 100_000)
+            
+            # 按SEED规范由采样率因子和乘数计算采样率，采样率为0的记录（如日志记录）视为瞬时记录
+            factor = headers['rate_factor'].astype(np.float64)
+            mult = headers['rate_mult'].astype(np.float64)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rate = np.where(factor > 0,
+                                np.where(mult >= 0, factor * mult, -factor / mult),
+                                np.where(mult > 0, -mult / factor, 1.0 / (factor * mult)))
+                duration_ns = np.where(np.isfinite(rate) & (rate > 0),
+                                       headers['nsamples'] / rate * 1e9, 0.0)
+            end_ns = start_ns + duration_ns.astype(np.int64)
+        # 释放对内存映射的引用后才能关闭
+        del headers
+    
+    if not valid:
+        return None
+    return start_ns, end_ns
+
+# MiniSEED时间窗口读取函数
+def _read_mseed_window(filename, mtime, record_length, byteorder, start_ns, end_ns):
+    """只读取与时间窗口重叠的MiniSEED记录，文件无法建立索引时返回None"""
+    index = _mseed_record_index(filename, mtime, record_length, byteorder)
+    if index is None:
+        return None
+    
+    # 两端各放宽1秒，覆盖记录头中未计入的时间校正，最终由read按时间窗口精确截取
+    margin_ns = 1_000_000_000
+    record_starts, record_ends = index
+    selected = np.flatnonzero((record_ends >= start_ns - margin_ns) & (record_starts <= end_ns + margin_ns))
+    if len(selected) == 0:
+        return Stream()
+    
+    # 将连续的记录合并为一段，按段从内存映射中拷贝
+    breaks = np.flatnonzero(np.diff(selected) != 1)
+    run_starts = selected[np.concatenate(([0], breaks + 1))]
+    run_ends = selected[np.concatenate((breaks, [len(selected) - 1]))] + 1
+    with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = b''.join(mm[a * record_length:b * record_length] for a, b in zip(run_starts, run_ends))
+    
+    return read(io.BytesIO(data), format='MSEED',
+                starttime=UTCDateTime(ns=start_ns), endtime=UTCDateTime(ns=end_ns))
+
+# 时间窗口读取结果的缓存，按波形数据字节数限制总占用，超出时淘汰最久未使用的窗口；
+# 加载任务在多个线程池线程中运行，读写缓存需加锁
+READ_CACHE_MAX_BYTES = 256 * 1024 * 1024
+_read_cache = OrderedDict()  # {(文件, 修改时间, 开始纳秒, 结束纳秒): (波形, 字节数)}
+_read_cache_bytes = 0
+_read_cache_lock = threading.Lock()
+
+# 波形读取缓存函数
+def _read_cached(filename, mtime, start_ns, end_ns, record_length=None, byteorder=None):
+    """读取时间窗口内的波形，结果按(文件, 修改时间, 时间窗口)缓存，文件被修改后自动失效；
+    提供MiniSEED记录布局时按记录索引只读取时间窗口内的数据。返回的波形为缓存共享对象，调用方不得原地修改"""
+    global _read_cache_bytes
+    key = (filename, mtime, start_ns, end_ns)
+    with _read_cache_lock:
+        entry = _read_cache.get(key)
+        if entry is not None:
+            _read_cache.move_to_end(key)
+            return entry[0]
+    
+    stream = None
+    if record_length is not None:
+        stream = _read_mseed_window(filename, mtime, record_length, byteorder, start_ns, end_ns)
+    if stream is None:
+        stream = read(filename, starttime=UTCDateTime(ns=start_ns), endtime=UTCDateTime(ns=end_ns))
+    
+    nbytes = sum(tr.data.nbytes for tr in stream)
+    if nbytes <= READ_CACHE_MAX_BYTES:
+        with _read_cache_lock:
+            if key not in _read_cache:
+                _read_cache[key] = (stream, nbytes)
+                _read_cache_bytes += nbytes
+                while _read_cache_bytes > READ_CACHE_MAX_BYTES:
+                    _, (_, evicted_bytes) = _read_cache.popitem(last=False)
+                    _read_cache_bytes -= evicted_bytes
+    return stream
+
+# 波形读取缓存清理函数
+def clear_read_cache():
+    """清空时间窗口读取缓存，切换波形文件时调用以释放内存"""
+    global _read_cache_bytes
+    with _read_cache_lock:
+        _read_cache.clear()
+        _read_cache_bytes = 0
+
+# 单通道预处理函数
+def _preprocess_trace(tr, sos):
+    """对单个通道去趋势并带通滤波，滤波结果替换该通道的数据；
+    返回共享去趋势数据、未经带通滤波的通道，作为模型输入"""
+    data = detrend(tr.data.astype(np.float32, copy=False), type='linear', overwrite_data=True)
+    raw_tr = Trace(data=data, header=tr.stats)
+    tr.data = sosfilt(sos, data)
+    return raw_tr
+
+# 波形加载信号类
+class WaveformLoaderSignals(QObject):
+    """波形加载任务的信号，由界面长期持有，多个加载任务共用，无需每次重新连接"""
     progressChanged = pyqtSignal(int)
-    finished = pyqtSignal(Stream)
-    error = pyqtSignal(str)
+    # 任务标识，显示用（带通滤波）和模型输入用（仅去趋势）的波形，以及各通道降采样后的绘图数据 {通道ID: (相对时间, 数据)}
+    finished = pyqtSignal(object, Stream, Stream, dict)
+    error = pyqtSignal(object, str)  # 任务标识，错误信息
     statusUpdate = pyqtSignal(str)
-    
-    def __init__(self, filename, start_time=None, end_time=None):
+
+# 波形加载任务类，在QThreadPool中运行，避免每次加载都创建新线程
+class WaveformLoadTask(QRunnable):
+    def __init__(self, signals, filename, start_time=None, end_time=None, head_stream=None, tag=None):
         super().__init__()
+        self.signals = signals
         self.filename = filename
         self.start_time = start_time
         self.end_time = end_time
+        self.head_stream = head_stream  # 只读取文件头的波形，用于判断能否按记录索引读取
+        self.tag = tag  # 任务标识，随结果一起发送，用于区分共用同一信号对象的任务
     
     def run(self):
         try:
-            self.statusUpdate.emit("正在加载波形数据...")
-            self.progressChanged.emit(10)
+            self.signals.statusUpdate.emit("正在加载波形数据...")
+            self.signals.progressChanged.emit(10)
             
             # 根据是否提供了时间窗口来决定加载方式
+            mtime = os.path.getmtime(self.filename)
             if self.start_time and self.end_time:
-                self.statusUpdate.emit(f"加载从 {self.start_time} 到 {self.end_time} 的数据...")
-                stream = read(self.filename, starttime=self.start_time, endtime=self.end_time)
+                self.signals.statusUpdate.emit(f"加载从 {self.start_time} 到 {self.end_time} 的数据...")
+                record_length, byteorder = (None, None) if self.head_stream is None else _mseed_layout(self.head_stream)
+                # 预处理会原地修改数据，使用缓存的副本
+                stream = _read_cached(self.filename, mtime, self.start_time.ns, self.end_time.ns,
+                                      record_length, byteorder).copy()
             else:
-                self.statusUpdate.emit("加载整个波形文件...")
+                # 整个文件不进入缓存，避免常驻整文件大小的内存
+                self.signals.statusUpdate.emit("加载整个波形文件...")
                 stream = read(self.filename)
             
-            self.progressChanged.emit(50)
-            
-            # 数据预处理
-            self.statusUpdate.emit("正在预处理波形数据...")
-            stream.detrend('linear')
-            
             # 获取采样率
             sampling_rate = stream[0].stats.sampling_rate
             nyquist = sampling_rate / 2.0
             
+            # 将采样率不一致的通道重采样到第一个通道的采样率，所有通道共用一组滤波器系数；
+            # ObsPy无法合并同一通道ID但采样率或数据类型不同的数据段，因此在合并之前重采样，
+            # 并统一转换为后续预处理使用的float32（重采样结果为float64）
+            for tr in stream:
+                if tr.stats.sampling_rate != sampling_rate:
+                    tr.resample(sampling_rate)
+                tr.data = tr.data.astype(np.float32, copy=False)
+            
+            # 合并同一通道被间隙分开的多段数据（间隙补零），减少后续各处理环节的通道数
+            stream.merge(method=1, fill_value=0, interpolation_samples=0)
+            
+            self.signals.progressChanged.emit(50)
+            
+            # 数据预处理
+            self.signals.statusUpdate.emit("正在预处理波形数据...")
+            
             # 确保高截止频率低于奈奎斯特频率
             freqmax = min(20.0, nyquist - 0.1)
             
-            stream.filter('bandpass', freqmin=1.0, freqmax=freqmax)
+            # 去趋势后使用SOS形式的4阶巴特沃斯带通滤波（与ObsPy的bandpass默认参数一致），
+            # 统一使用float32以减少内存带宽
+            sos = iirfilter(4, [1.0 / nyquist, freqmax / nyquist], btype='band',
+                            ftype='butter', output='sos').astype(np.float32)
             
-            self.progressChanged.emit(100)
-            self.statusUpdate.emit("波形数据加载和预处理完成")
-            self.finished.emit(stream)
+            # 各通道相互独立且SciPy的滤波内核会释放GIL，使用线程池并行处理；
+            # 带通滤波仅用于显示，神经网络模型自带归一化等预处理，使用仅去趋势的波形作为输入
+            max_workers = min(len(stream), os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                raw_stream = Stream(traces=list(executor.map(lambda tr: _preprocess_trace(tr, sos), stream)))
+            
+            # 在加载线程中完成绘图所需的降采样，GUI线程只需更新曲线数据
+            plot_payload = {tr.id: minmax_downsample(tr.times(), tr.data) for tr in stream}
+            
+            self.signals.progressChanged.emit(100)
+            self.signals.statusUpdate.emit("波形数据加载和预处理完成")
+            self.signals.finished.emit(self.tag, stream, raw_stream, plot_payload)
             
         except Exception as e:
             traceback.print_exc()
-            self.error.emit(str(e))
+            self.signals.error.emit(self.tag, str(e))
+
+# 图像导出信号类
+class ImageExportSignals(QObject):
+    """图像导出任务的信号"""
+    finished = pyqtSignal(str)  # 保存的文件名
+    error = pyqtSignal(str)  # 错误信息
+
+# 图像导出任务类，在QThreadPool中完成图像编码和写文件，避免PNG/JPG压缩阻塞界面
+class ImageExportTask(QRunnable):
+    def __init__(self, signals, rgba, size, filename):
+        super().__init__()
+        self.signals = signals
+        self.rgba = rgba  # 界面线程中栅格化得到的RGBA字节
+        self.size = size  # 图像(宽, 高)像素
+        self.filename = filename
+    
+    def run(self):
+        try:
+            from PIL import Image
+            image = Image.frombuffer('RGBA', self.size, self.rgba, 'raw', 'RGBA', 0, 1)
+            if os.path.splitext(self.filename)[1].lower() in ('.jpg', '.jpeg'):
+                image.convert('RGB').save(self.filename)
+            else:
+                # 使用较低的zlib压缩级别，文件略大但编码快得多
+                image.save(self.filename, format='PNG', compress_level=1)
+            self.signals.finished.emit(self.filename)
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(str(e))
 
 # 相位检测线程类
 class PhaseDetectionThread(QThread):
     # 定义信号
     progressChanged = pyqtSignal(int)  # 进度更新信号
-    finished = pyqtSignal(list)  # 完成信号，返回检测到的相位
+    finished = pyqtSignal(pd.DataFrame)  # 完成信号，返回检测到的相位表
     error = pyqtSignal(str)  # 错误信号
     statusUpdate = pyqtSignal(str)  # 状态更新信号
     
-    def __init__(self, model, stream, threshold, chunk_mode=False, chunk_size=None):
+    def __init__(self, model, stream, threshold, chunk_mode=False, chunk_size=None, batch_size=None):
         super().__init__()
         self.model = model
         self.stream = stream
         self.threshold = threshold
         self.chunk_mode = chunk_mode
         self.chunk_size = chunk_size  # 单位:秒
+        self.batch_size = batch_size  # 模型推理的批大小，为None时根据设备自动估算
+        self.device = 'cpu'  # 推理设备，线程启动时确定
+        
+    def _auto_batch_size(self):
+        """根据推理设备和当前可用显存估算批大小"""
+        if self.device != 'cuda':
+            return 16
+        
+        # 按FP32三分量输入窗口估算单个窗口的显存占用，取可用显存的40%；
+        # 该估算未计入中间激活，因此设置上限避免显存溢出
+        free_bytes, _ = _torch().cuda.mem_get_info()
+        in_samples = getattr(self.model, 'in_samples', 6000)
+        per_window_bytes = 3 * in_samples * 4
+        return int(min(256, max(32, free_bytes * 0.4 / per_window_bytes)))
+    
+    def _wrap_forward(self, forward):
+        """包装模型的forward，在实际执行前向计算的线程内关闭梯度记录，CUDA可用时使用FP16自动混合精度。
+        SeisBench的classify通过asyncio在工作线程中执行前向计算，调用线程进入的上下文对其不生效；
+        输出的浮点张量转回float32，后处理不受FP16精度影响"""
+        torch = _torch()
+        use_fp16 = self.device == 'cuda'
+        
+        def to_float32(output):
+            if isinstance(output, torch.Tensor):
+                return output.float() if output.is_floating_point() else output
+            if isinstance(output, (tuple, list)):
+                return type(output)(to_float32(item) for item in output)
+            return output
+        
+        def forward_in_context(*args, **kwargs):
+            if use_fp16:
+                autocast = torch.autocast(device_type='cuda', dtype=torch.float16)
+            else:
+                autocast = contextlib.nullcontext()
+            with torch.no_grad(), autocast:
+                return to_float32(forward(*args, **kwargs))
+        
+        return forward_in_context
+    
+    def _classify(self, stream):
+        """调用模型检测相位，调用期间临时替换模型实例的forward，结束后恢复"""
+        instance_forward = self.model.__dict__.get('forward')
+        self.model.forward = self._wrap_forward(self.model.forward)
+        try:
+            return self.model.classify(stream, batch_size=self.batch_size,
+                                       P_threshold=self.threshold, S_threshold=self.threshold)
+        finally:
+            if instance_forward is None:
+                del self.model.forward
+            else:
+                self.model.forward = instance_forward
+    
+    def _picks_to_columns(self, pred_picks, report_progress=False):
+        """将模型输出的拾取写入预分配的列数组（时间为时间戳），不再为每个拾取创建字典"""
+        total_picks = len(pred_picks)
+        times_ns = np.empty(total_picks, dtype=np.int64)
+        phases = np.empty(total_picks, dtype=object)
+        channels = np.empty(total_picks, dtype=object)
+        probs = np.empty(total_picks, dtype=np.float32)
+        last_progress = -1
+        
+        for i, pick in enumerate(pred_picks):
+            times_ns[i] = pick.start_time.ns
+            phases[i] = pick.phase
+            # 截取到第二个点之前作为通道ID，避免split/join产生临时列表
+            tid = pick.trace_id
+            q = tid.find('.', tid.find('.') + 1)
+            channels[i] = tid[:q] if q >= 0 else tid
+            probs[i] = pick.peak_value
+            
+            # 更新进度，仅在百分比变化时发送信号，避免跨线程信号淹没GUI事件循环
+            if report_progress:
+                progress = int((i + 1) / total_picks * 100)
+                if progress != last_progress:
+                    last_progress = progress
+                    self.progressChanged.emit(progress)
+        
+        # 纳秒整数一次性转换为时间戳，避免逐个调用UTCDateTime.timestamp
+        times = times_ns.astype(np.float64) * 1e-9
+        return times, phases, channels, probs
         
     def run(self):
         try:
-            picks = []
+            # 选择推理设备并切换模型到推理模式
+            self.device = 'cuda' if _torch().cuda.is_available() else 'cpu'
+            self.model.to(self.device).eval()
+            if self.batch_size is None:
+                self.batch_size = self._auto_batch_size()
             
             if not self.chunk_mode or not self.chunk_size:
                 # 常规处理 - 一次性处理整个流
                 self.statusUpdate.emit("正在检测相位...")
-                pred = self.model.classify(self.stream, P_threshold=self.threshold, S_threshold=self.threshold)
+                pred = self._classify(self.stream)
                 
                 # 处理预测结果
-                total_picks = len(pred.picks)
-                for i, pick in enumerate(pred.picks):
-                    prob = pick.peak_value
-                    phase_name = pick.phase
-                    start_time = pick.start_time
-                    trace_id = '.'.join(pick.trace_id.split('.', 2)[:2])
-                    picks.append({
-                        'time': start_time,
-                        'phase': phase_name,
-                        'channel': trace_id,
-                        'probability': pick.peak_value
-                    })
-                    
-                    # 更新进度
-                    progress = int((i + 1) / total_picks * 100) if total_picks > 0 else 100
-                    self.progressChanged.emit(progress)
+                times, phases, channels, probs = self._picks_to_columns(pred.picks, report_progress=True)
                 
             else:
                 # 分块处理
@@ -108,8 +405,13 @@ class PhaseDetectionThread(QThread):
                 
                 # 获取流的时间范围
                 self.statusUpdate.emit("准备分块处理...")
-                start_time = min([tr.stats.starttime for tr in self.stream])
-                end_time = max([tr.stats.endtime for tr in self.stream])
+                num_traces = len(self.stream)
+                trace_starts = np.fromiter((tr.stats.starttime.timestamp for tr in self.stream),
+                                           dtype=np.float64, count=num_traces)
+                trace_ends = np.fromiter((tr.stats.endtime.timestamp for tr in self.stream),
+                                         dtype=np.float64, count=num_traces)
+                start_time = self.stream[int(np.argmin(trace_starts))].stats.starttime
+                end_time = self.stream[int(np.argmax(trace_ends))].stats.endtime
                 total_duration = end_time - start_time
                 
                 # 计算块数
@@ -117,54 +419,128 @@ class PhaseDetectionThread(QThread):
                 chunk_minutes = self.chunk_size / 60
                 self.statusUpdate.emit(f"将以 {chunk_minutes:.1f} 分钟为块大小，分成 {num_chunks} 个块进行处理...")
                 
-                # 逐块处理
-                for chunk_idx in range(num_chunks):
-                    try:
-                        chunk_start = start_time + chunk_idx * self.chunk_size
-                        chunk_end = min(chunk_start + self.chunk_size, end_time)
-                        
-                        # 确保开始时间小于结束时间
-                        if chunk_end <= chunk_start:
-                            self.statusUpdate.emit(f"跳过无效时间块 {chunk_idx+1}/{num_chunks}: {chunk_start} - {chunk_end}")
+                # 预先提取各通道的采样率和数据引用，切块时直接计算样本索引，
+                # 用numpy视图构造块内通道，避免Stream.slice逐块扫描所有通道并复制数据
+                trace_rates = np.array([tr.stats.sampling_rate for tr in self.stream], dtype=np.float64)
+                trace_npts = np.array([tr.stats.npts for tr in self.stream], dtype=np.int64)
+                trace_data = [tr.data for tr in self.stream]
+                
+                # 每组合并的块数：使每次调用模型至少包含约batch_size个模型窗口，
+                # 由SeisBench内部按batch_size分批送入GPU
+                window_seconds = getattr(self.model, 'in_samples', 6000) / float(np.max(trace_rates))
+                chunks_per_group = max(1, int(np.ceil(self.batch_size * window_seconds / self.chunk_size)))
+                
+                # 生产者线程切分时间块并按组合并后放入有界队列，当前线程同时对上一组调用模型，
+                # 使切分与推理重叠；队列容量为2，内存中最多同时存在两组待推理数据
+                group_queue = queue.Queue(maxsize=2)
+                stop_event = threading.Event()
+                
+                def put_group(item):
+                    # 推理出错时停止等待，避免生产者线程永久阻塞
+                    while not stop_event.is_set():
+                        try:
+                            group_queue.put(item, timeout=0.1)
+                            return
+                        except queue.Full:
                             continue
+                
+                def produce_chunk_groups():
+                    status_interval = max(1, num_chunks // 100)  # 每处理约1%的块才更新一次状态
+                    group_indices = []
+                    group_stream = Stream()
+                    try:
+                        for chunk_idx in range(num_chunks):
+                            if stop_event.is_set():
+                                return
+                            try:
+                                chunk_start = start_time + chunk_idx * self.chunk_size
+                                chunk_end = min(chunk_start + self.chunk_size, end_time)
+                                
+                                # 确保开始时间小于结束时间
+                                if chunk_end <= chunk_start:
+                                    self.statusUpdate.emit(f"跳过无效时间块 {chunk_idx+1}/{num_chunks}: {chunk_start} - {chunk_end}")
+                                    continue
+                                
+                                # 提取当前时间块
+                                if chunk_idx % status_interval == 0:
+                                    self.statusUpdate.emit(f"切分时间块 {chunk_idx+1}/{num_chunks}: {chunk_start} - {chunk_end}")
+                                
+                                # 从原始流切片出当前时间块（取最接近的采样点，首尾均包含）
+                                i0 = np.maximum(0, np.rint((chunk_start.timestamp - trace_starts) * trace_rates).astype(np.int64))
+                                i1 = np.minimum(trace_npts, np.rint((chunk_end.timestamp - trace_starts) * trace_rates).astype(np.int64) + 1)
+                                
+                                chunk_stream = Stream()
+                                for k in np.flatnonzero(i1 > i0):
+                                    stats = self.stream[k].stats
+                                    header = {
+                                        'network': stats.network,
+                                        'station': stats.station,
+                                        'location': stats.location,
+                                        'channel': stats.channel,
+                                        'sampling_rate': stats.sampling_rate,
+                                        'starttime': stats.starttime + i0[k] / trace_rates[k]
+                                    }
+                                    chunk_stream.append(Trace(data=trace_data[k][i0[k]:i1[k]], header=header))
+                                
+                                if len(chunk_stream) > 0:
+                                    group_indices.append(chunk_idx)
+                                    group_stream += chunk_stream
+                                else:
+                                    self.statusUpdate.emit(f"块 {chunk_idx+1} 没有可用数据，跳过")
+                                    
+                            except ValueError as e:
+                                self.statusUpdate.emit(f"处理块 {chunk_idx+1} 时出错: {str(e)}，跳过此块")
+                            except Exception as e:
+                                self.statusUpdate.emit(f"处理块 {chunk_idx+1} 时出现未知错误: {str(e)}，跳过此块")
+                            
+                            if len(group_indices) >= chunks_per_group:
+                                put_group((group_indices, group_stream))
+                                group_indices = []
+                                group_stream = Stream()
                         
-                        # 提取当前时间块
-                        self.statusUpdate.emit(f"处理时间块 {chunk_idx+1}/{num_chunks}: {chunk_start} - {chunk_end}")
+                        if group_indices:
+                            put_group((group_indices, group_stream))
+                    finally:
+                        # 结束标记
+                        put_group(None)
+                
+                producer = threading.Thread(target=produce_chunk_groups, daemon=True)
+                producer.start()
+                
+                # 消费者：逐组调用模型并收集相位
+                collected = []
+                try:
+                    while True:
+                        group = group_queue.get()
+                        if group is None:
+                            break
                         
-                        # 从原始流切片出当前时间块
-                        chunk_stream = self.stream.slice(chunk_start, chunk_end)
+                        group_indices, group_stream = group
+                        self.statusUpdate.emit(f"检测块 {group_indices[0]+1}-{group_indices[-1]+1}/{num_chunks} 中的相位...")
+                        pred = self._classify(group_stream)
+                        collected.append(self._picks_to_columns(pred.picks))
                         
-                        # 处理当前块
-                        if len(chunk_stream) > 0:
-                            self.statusUpdate.emit(f"检测块 {chunk_idx+1} 中的相位...")
-                            pred = self.model.classify(chunk_stream, P_threshold=self.threshold, S_threshold=self.threshold)
-                            
-                            # 添加当前块中的相位
-                            for pick in pred.picks:
-                                prob = pick.peak_value
-                                phase_name = pick.phase
-                                pick_time = pick.start_time
-                                trace_id = '.'.join(pick.trace_id.split('.', 2)[:2])
-                                picks.append({
-                                    'time': pick_time,
-                                    'phase': phase_name,
-                                    'channel': trace_id,
-                                    'probability': pick.peak_value
-                                })
-                        else:
-                            self.statusUpdate.emit(f"块 {chunk_idx+1} 没有可用数据，跳过")
-                            
-                    except ValueError as e:
-                        self.statusUpdate.emit(f"处理块 {chunk_idx+1} 时出错: {str(e)}，跳过此块")
-                    except Exception as e:
-                        self.statusUpdate.emit(f"处理块 {chunk_idx+1} 时出现未知错误: {str(e)}，跳过此块")
-                    
-                    # 更新总体进度
-                    progress = int((chunk_idx + 1) / num_chunks * 100)
-                    self.progressChanged.emit(progress)
+                        # 更新总体进度
+                        self.progressChanged.emit(int((group_indices[-1] + 1) / num_chunks * 100))
+                finally:
+                    stop_event.set()
+                    producer.join()
+                
+                if collected:
+                    times, phases, channels, probs = (np.concatenate(column) for column in zip(*collected))
+                else:
+                    times, phases, channels, probs = self._picks_to_columns([])
+                
+                self.progressChanged.emit(100)
             
-            # 结果排序
-            picks.sort(key=lambda x: x['time'])
+            # 结果按时间戳排序后组装为按列存储的相位表
+            order = np.argsort(times, kind='stable')
+            picks = pd.DataFrame({
+                'time': times[order],
+                'phase': phases[order],
+                'channel': channels[order],
+                'probability': probs[order]
+            }, copy=False)
             self.statusUpdate.emit(f"检测完成，共找到 {len(picks)} 个相位")
             
             # 发送完成信号
@@ -195,48 +571,43 @@ class EventAssociationThread(QThread):
             self.statusUpdate.emit("准备关联数据...")
             self.progressChanged.emit(10)
             
-            # 获取所有有效台站的ID列表
-            valid_stations = set(self.stations_df['id'].values)
-            
-            # 转换picks格式为PyOcto格式
-            pyocto_picks_data = {
-                'station': [],
-                'phase': [],
-                'time': [],
-                'probability': []
-            }
-            
-            filtered_picks = []
-            missing_stations = set()
+            # 获取所有有效台站的ID，排序后用于二分查找判断成员关系
+            valid_stations = np.unique(self.stations_df['id'].to_numpy(dtype=str))
             
             # 发送状态更新
             self.statusUpdate.emit("处理拾取数据...")
             self.progressChanged.emit(20)
             
-            for pick in self.picks:
-                # 从通道中提取台站ID
-                station_parts = pick['channel'].split('.')
-                station_id = f"{station_parts[0]}.{station_parts[1]}."
-                
-                if station_id in valid_stations:
-                    pyocto_picks_data['station'].append(station_id)
-                    pyocto_picks_data['phase'].append(pick['phase'])
-                    pyocto_picks_data['time'].append(pick['time'].timestamp)
-                    pyocto_picks_data['probability'].append(pick['probability'])
-                    filtered_picks.append(pick)
-                else:
-                    missing_stations.add(station_id)
+            # 转换picks格式为PyOcto格式，按列向量化处理，避免逐个拾取的Python循环
+            raw_picks = self.picks
+            
+            # 从通道中提取台站ID
+            station_id = (raw_picks['channel'].str.split('.', n=2).str[:2].str.join('.') + '.').to_numpy(dtype=str)
+            
+            # 在排序后的台站ID数组中二分查找，得到每个拾取是否属于有效台站
+            if len(valid_stations) > 0:
+                idx = np.searchsorted(valid_stations, station_id)
+                mask = (idx < len(valid_stations)) & (valid_stations[np.minimum(idx, len(valid_stations) - 1)] == station_id)
+            else:
+                mask = np.zeros(len(station_id), dtype=bool)
+            missing_stations = set(station_id[~mask])
+            num_filtered = int(mask.sum())
             
             # 检查是否还有足够的拾取
-            if len(filtered_picks) == 0:
+            if num_filtered == 0:
                 self.error.emit("所有拾取都被过滤掉了，没有拾取与台站信息匹配")
                 return
             
-            # 创建过滤后的pandas数据框
-            picks_df = pd.DataFrame(pyocto_picks_data)
+            # 创建过滤后的pandas数据框，每列直接由定类型的numpy数组构造，不再额外复制
+            picks_df = pd.DataFrame({
+                'station': station_id[mask].astype(object),
+                'phase': raw_picks.loc[mask, 'phase'].to_numpy(dtype=object),
+                'time': raw_picks.loc[mask, 'time'].to_numpy(dtype=np.float64),
+                'probability': raw_picks.loc[mask, 'probability'].to_numpy(dtype=np.float32)
+            }, copy=False)
             
             # 发送状态更新
-            self.statusUpdate.emit(f"开始关联 {len(filtered_picks)} 个拾取点...")
+            self.statusUpdate.emit(f"开始关联 {num_filtered} 个拾取点...")
             self.progressChanged.emit(30)
             
             # 使用associate方法
@@ -268,6 +639,7 @@ def load_neural_model(model_name):
     try:
         import seisbench
         seisbench.use_backup_repository()  # 使用备用下载库
+        sbm = _sbm()
         
         if model_name == "EQTransformer":
             model = sbm.EQTransformer.from_pretrained("original")
@@ -286,45 +658,123 @@ def load_neural_model(model_name):
         traceback.print_exc()
         return None, str(e)
 
+# 默认均匀速度模型参数，使用元组以便作为缓存键
+DEFAULT_VELOCITY_PARAMS = (
+    ('p_velocity', 7.0),      # P波速度 (km/s)
+    ('s_velocity', 4.0),      # S波速度 (km/s)
+    ('tolerance', 2.0),       # 速度模型容差 (s)
+    ('association_cutoff_distance', 250),  # 用于空间分区关联的最大台站距离 (km)
+)
+
+# 检查PyOcto是否支持速度模型，首次构建关联器时确定一次，之后直接选择对应分支
+@lru_cache(maxsize=None)
+def _check_velocity_model_support():
+    """检查已安装的PyOcto是否提供VelocityModel0D且from_area接受velocity_model参数"""
+    pyocto = _pyocto()
+    if not hasattr(pyocto, 'VelocityModel0D'):
+        return False
+    try:
+        params = inspect.signature(pyocto.OctoAssociator.from_area).parameters
+    except (TypeError, ValueError):
+        # 无法获取签名（如扩展模块实现）时按支持处理
+        return True
+    return 'velocity_model' in params or any(
+        p.kind is inspect.Parameter.VAR_KEYWORD for p in params.values())
+
+# 关联器构建函数，相同参数的关联器被缓存复用
+@lru_cache(maxsize=8)
+def _create_associator(lat, lon, zlim, time_before, velocity_params, n_picks, n_p_and_s_picks):
+    """创建PyOcto关联器，失败时抛出异常（异常不会被缓存）"""
+    pyocto = _pyocto()
+    kwargs = {}
+    if _check_velocity_model_support():
+        # 根据官方文档配置均匀速度模型
+        kwargs['velocity_model'] = pyocto.VelocityModel0D(**dict(velocity_params))
+    
+    # 创建关联器，使用from_area方法自动选择局部坐标投影；不支持速度模型时直接创建
+    return pyocto.OctoAssociator.from_area(
+        lat=lat,                  # 纬度范围
+        lon=lon,                  # 经度范围
+        zlim=zlim,                # 深度范围 (km)
+        time_before=time_before,  # 重叠时间 (s)
+        n_picks=n_picks,          # 最小拾取数
+        n_p_and_s_picks=n_p_and_s_picks,  # 最小P和S波拾取数
+        **kwargs                  # 速度模型
+    )
+
 # 创建关联器函数
-def setup_associator():
+def setup_associator(lat=(-25, -18), lon=(-71.5, -68), zlim=(0, 200), time_before=300,
+                     velocity_params=DEFAULT_VELOCITY_PARAMS, n_picks=10, n_p_and_s_picks=4):
     """配置PyOcto关联器"""
     try:
-        # 根据官方文档配置均匀速度模型
-        velocity_model = pyocto.VelocityModel0D(
-            p_velocity=7.0,      # P波速度 (km/s)
-            s_velocity=4.0,      # S波速度 (km/s)
-            tolerance=2.0,       # 速度模型容差 (s)
-            association_cutoff_distance=250,  # 用于空间分区关联的最大台站距离 (km)
-        )
-        
-        # 创建关联器，使用from_area方法自动选择局部坐标投影
-        associator = pyocto.OctoAssociator.from_area(
-            lat=(-25, -18),      # 纬度范围
-            lon=(-71.5, -68),    # 经度范围
-            zlim=(0, 200),       # 深度范围 (km)
-            time_before=300,     # 重叠时间 (s)
-            velocity_model=velocity_model,  # 速度模型
-            n_picks=10,          # 最小拾取数
-            n_p_and_s_picks=4,   # 最小P和S波拾取数
-        )
-        
+        associator = _create_associator(lat, lon, zlim, time_before, velocity_params,
+                                        n_picks, n_p_and_s_picks)
         return associator, None
         
     except Exception as e:
-        # 尝试不使用速度模型直接创建关联器
-        try:
-            associator = pyocto.OctoAssociator.from_area(
-                lat=(-25, -18),      # 纬度范围
-                lon=(-71.5, -68),    # 经度范围
-                zlim=(0, 200),       # 深度范围 (km)
-                time_before=300,     # 重叠时间 (s)
-                n_picks=10,          # 最小拾取数
-                n_p_and_s_picks=4,   # 最小P和S波拾取数
-            )
-            return associator, None
-        except Exception as e2:
-            traceback.print_exc()
-            return None, str(e2)
+        traceback.print_exc()
+        return None, str(e)
+
+# 波形批量预处理函数
+def preprocess_stream(stream, freqmin=1.0, freqmax=20.0):
+    """将采样率和长度相同的通道堆叠为二维数组，整体去趋势并带通滤波，结果原地写回stream；
+    返回仅去趋势、未经带通滤波的波形，作为模型输入"""
+    groups = {}
+    for i, tr in enumerate(stream):
+        groups.setdefault((tr.stats.sampling_rate, tr.stats.npts), []).append(i)
+    
+    raw_traces = [None] * len(stream)
+    for (sampling_rate, _), indices in groups.items():
+        # 确保高截止频率低于奈奎斯特频率
+        nyquist = sampling_rate / 2.0
+        sos = iirfilter(4, [freqmin / nyquist, min(freqmax, nyquist - 0.1) / nyquist], btype='band',
+                        ftype='butter', output='sos').astype(np.float32)
+        
+        data = np.stack([stream[i].data for i in indices]).astype(np.float32, copy=False)
+        data = detrend(data, axis=1, type='linear', overwrite_data=True)
+        filtered = sosfilt(sos, data, axis=1)
+        for row, i in enumerate(indices):
+            raw_traces[i] = Trace(data=data[row], header=stream[i].stats)
+            stream[i].data = filtered[row]
+    
+    return Stream(traces=raw_traces)
+
+# 波形显示降采样函数
+def minmax_downsample(times, data, target_px=2000):
+    """将长波形按像素分段，每段保留最小值和最大值（按时间先后），峰值包络与原波形绘制效果一致"""
+    bucket = len(data) // target_px
+    if bucket < 2:
+        return times, data
+    
+    used = bucket * target_px
+    blocks = data[:used].reshape(target_px, bucket)
+    argmin = blocks.argmin(axis=1)
+    argmax = blocks.argmax(axis=1)
+    offsets = np.arange(target_px) * bucket
+    
+    indices = np.empty(2 * target_px + len(data) - used, dtype=np.int64)
+    indices[0:2 * target_px:2] = offsets + np.minimum(argmin, argmax)
+    indices[1:2 * target_px:2] = offsets + np.maximum(argmin, argmax)
+    indices[2 * target_px:] = np.arange(used, len(data))  # 不足一段的尾部样本原样保留
+    return times[indices], data[indices]
+
+# 波形去趋势与振幅函数
+def detrend_maxabs(data):
+    """按最小二乘闭式解一次去除均值和线性趋势，返回float32结果及其最大绝对振幅；
+    趋势项写入复用的时间轴缓冲区，只分配一个与波形等长的数组"""
+    data = np.asarray(data, dtype=np.float32)
+    n = len(data)
+    if n == 0:
+        return data.copy(), 0.0
+    
+    t = np.arange(n, dtype=np.float32)
+    t -= (n - 1) / 2.0
+    # 中心化时间轴的平方和为n(n²-1)/12，内积按float64累加以保证长波形的斜率精度
+    slope = np.einsum('i,i->', t, data, dtype=np.float64) / (n * (n * n - 1) / 12.0) if n > 1 else 0.0
+    detrended = t
+    detrended *= -slope
+    detrended += data
+    detrended -= data.mean(dtype=np.float64)
+    return detrended, float(max(detrended.max(), -detrended.min()))
 
 # 其他实用函数可以根据需要添加到这里 
\ No newline at end of file
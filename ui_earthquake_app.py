@@ -3,8 +3,11 @@ import os
 import numpy as np
 import pandas as pd
 import matplotlib
-import matplotlib.pyplot as plt
 import traceback
+import hashlib
+import tempfile
+import contextlib
+from collections import OrderedDict
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QPushButton, QFileDialog, QLabel, 
                              QComboBox, QToolBar, QAction, QMessageBox, QScrollArea,
@@ -12,28 +15,71 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QDialog, QProgressBar, QDateTimeEdit, QCheckBox, 
                              QGroupBox, QFormLayout, QDialogButtonBox, QSpinBox,
                              QSizePolicy)
-from PyQt5.QtCore import Qt, QDateTime
+from PyQt5.QtCore import Qt, QDateTime, QThreadPool, QStandardPaths
 from PyQt5.QtGui import QPixmap, QIcon, QFont
 matplotlib.use('Qt5Agg')
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
-from mpl_toolkits.mplot3d import Axes3D
-from obspy import read, read_inventory, UTCDateTime
-from datetime import datetime
+from matplotlib.collections import LineCollection
+from obspy import read, read_inventory, Stream, Trace, UTCDateTime
 
 # 导入我们的地震处理功能文件
-from seismic_processor import (WaveformLoadThread, PhaseDetectionThread, 
-                             EventAssociationThread, load_neural_model, setup_associator)
-
-# 导入滚动波形显示组件
-from scrolling_waveform import ScrollingWaveformDisplay
-
-# 导入地震目录可视化模块
-from catalog_visualizer import CatalogVisualizer
+from seismic_processor import (WaveformLoaderSignals, WaveformLoadTask, PhaseDetectionThread, 
+                             EventAssociationThread, load_neural_model, setup_associator,
+                             preprocess_stream, minmax_downsample, detrend_maxabs,
+                             ImageExportSignals, ImageExportTask, clear_read_cache)
 
 # 导入地图可视化模块
 from map_visualizer import MapVisualizer, EmbeddedMapWidget
 
+# 台站数据框缓存目录函数
+def _station_cache_dir():
+    """返回当前用户私有缓存目录下的台站数据框缓存目录，不使用所有用户共享的临时目录"""
+    base = QStandardPaths.writableLocation(QStandardPaths.CacheLocation)
+    return os.path.join(base or os.path.expanduser("~/.cache"), "seismic_station_cache")
+
+# 控件重绘暂停函数
+@contextlib.contextmanager
+def _updates_suspended(widget):
+    """暂停控件及其子控件的重绘，结束后恢复并统一重绘一次；嵌套使用时由最外层恢复"""
+    enabled = widget.updatesEnabled()
+    widget.setUpdatesEnabled(False)
+    try:
+        yield
+    finally:
+        if enabled:
+            widget.setUpdatesEnabled(True)
+            widget.update()
+
+# 子图边距读取函数
+def _subplot_params(figure):
+    """读取图形当前的子图边距，供相同布局时通过subplots_adjust直接复用"""
+    pars = figure.subplotpars
+    return dict(left=pars.left, right=pars.right, bottom=pars.bottom,
+                top=pars.top, wspace=pars.wspace, hspace=pars.hspace)
+
+# 台站数据框缓存读写函数
+def _save_station_table(df, filename):
+    """将台站数据框按列保存为npz，非数值列转为定长字符串数组，读取时无需pickle；
+    先写入同目录的临时文件再整体替换，写入中断时不会留下不完整的缓存文件"""
+    fd, tmp_name = tempfile.mkstemp(dir=os.path.dirname(filename), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **{str(col): (df[col].to_numpy() if df[col].dtype.kind in 'biuf'
+                                      else df[col].to_numpy().astype(str))
+                           for col in df.columns})
+        os.replace(tmp_name, filename)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_name)
+        raise
+
+def _load_station_table(filename):
+    """读取_save_station_table保存的台站数据框，禁止pickle，缓存文件无法执行代码"""
+    with np.load(filename, allow_pickle=False) as data:
+        return pd.DataFrame({col: (data[col].astype(object) if data[col].dtype.kind == 'U' else data[col])
+                             for col in data.files})
+
 # 时间窗口选择对话框
 class TimeWindowDialog(QDialog):
     def __init__(self, parent=None, start_time=None, end_time=None):
@@ -142,6 +188,15 @@ class TimeWindowDialog(QDialog):
 
 # 主应用程序窗口类
 class SeismicPhasePicker(QMainWindow):
+    _ICON_CACHE = {}  # 图标缓存 {图标路径: QIcon}，所有窗口共享
+    
+    @classmethod
+    def _icon(cls, path):
+        """返回缓存的图标，文件不存在时返回空图标"""
+        if path not in cls._ICON_CACHE:
+            cls._ICON_CACHE[path] = QIcon(path) if os.path.exists(path) else QIcon()
+        return cls._ICON_CACHE[path]
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle('Seismic Phase Picker')  # 设置窗口标题
@@ -149,7 +204,10 @@ class SeismicPhasePicker(QMainWindow):
         
         # 初始化变量
         self.stream = None
-        self.picks = []
+        self.raw_stream = None  # 模型输入波形（仅去趋势，未带通滤波）
+        self.picks = None  # 相位检测结果数据框
+        self._pick_columns = None  # 相位表各列的numpy数组及各通道的行索引，随相位表更新
+        self._trace_channel_key = {}  # 波形通道ID到相位表通道ID（台网.台站）的映射
         self.model = None
         self.catalog = None  # 存储关联结果的目录
         self.associator = None  # PyOcto关联器
@@ -157,16 +215,56 @@ class SeismicPhasePicker(QMainWindow):
         self.stations_df = None  # 测站信息数据框
         self.events_df = None  # 事件数据框
         self.assignments_df = None  # 相位关联数据框
+        self._catalog_figure = None  # 地震目录可视化对话框的图形，首次打开时创建，之后重复使用
+        
+        # 波形图缓存：通道布局不变时复用子图和波形曲线，只更新数据和标记
+        self._plot_key = None  # 当前图形对应的通道布局
+        self._trace_axes = []  # 每个通道的子图
+        self._trace_lines = []  # 每个通道的波形曲线
+        self._overlay_artists = []  # 相位、事件等标记，每次重绘前移除
+        self._display_cache = {}  # 各通道用于显示的(原始数据, 降采样相对时间轴, 降采样float32数据)，数据不变时直接复用
+        self._background = None  # 不含标记的波形图像缓存，每次完整绘制后更新，用于blit局部刷新
+        self._exporting = False  # 导出图像时的绘制不更新背景缓存
+        self._plotted_stream = None  # 图中曲线当前对应的波形
+        self._layout_state = None  # (通道数, 图形高度)，通道数不变时不重新设置尺寸
+        self._subplot_params = {}  # tight_layout计算出的子图边距 {(通道数, 分块模式, 图形尺寸): 边距参数}
+        self._ylim_cache = []  # 各子图纵轴上限，每次完整绘制后更新，标记定位时直接使用
         
         # 添加分块处理参数
         self.current_file = None  # 当前加载的文件路径
+        self._head_stream = None  # 当前文件只读取文件头的波形，分块加载时用于按记录索引读取
+        self._prefetched_chunks = {}  # 预取的相邻数据块 {块索引: (显示波形, 模型输入波形, 绘图数据)}
+        self._prefetch_pending = set()  # 正在预取的(打开编号, 文件, 块索引)
+        self._open_generation = 0  # 每次重新打开文件时递增，分块大小或时间窗口变化后丢弃旧网格的预取结果
+        self._chunk_cache = OrderedDict()  # 最近查看的数据块 {(文件, 块索引): (显示波形, 模型输入波形, 绘图数据)}
+        self._chunk_cache_size = 8  # 数据块缓存容量，超出时淘汰最久未查看的块
         self.chunk_mode = False  # 是否使用分块模式
         self.chunk_size = None  # 分块大小（秒）
+        self._chunk_time_strings = []  # 各数据块的(开始时间, 结束时间)显示字符串，选择文件时一次生成
         self.time_window = {  # 时间窗口
             'start_time': None,
             'end_time': None
         }
         
+        # 波形加载线程池和共用信号，前台加载和后台预取分别使用一组信号
+        self.load_pool = QThreadPool()
+        self.load_pool.setMaxThreadCount(2)
+        self._load_request_id = 0  # 最新一次前台加载请求的编号，较早请求的结果被丢弃
+        self.load_signals = WaveformLoaderSignals()
+        self.load_signals.progressChanged.connect(self.update_progress)
+        self.load_signals.finished.connect(self.on_load_task_finished)
+        self.load_signals.error.connect(self.on_load_task_error)
+        self.load_signals.statusUpdate.connect(self.update_status)
+        self.prefetch_signals = WaveformLoaderSignals()
+        self.prefetch_signals.finished.connect(self.on_chunk_prefetched)
+        self.prefetch_signals.error.connect(self.on_prefetch_error)
+        
+        # 图像导出在全局线程池中编码写文件，不占用波形加载线程
+        self.export_pool = QThreadPool.globalInstance()
+        self.export_signals = ImageExportSignals()
+        self.export_signals.finished.connect(self.on_image_exported)
+        self.export_signals.error.connect(self.on_image_export_error)
+        
         # 设置用户界面
         self.setup_ui()
         
@@ -195,12 +293,12 @@ class SeismicPhasePicker(QMainWindow):
         self.addToolBar(toolbar)
         
          # 添加分块导航按钮
-        self.prev_chunk_btn = QAction(QIcon("icons/prev.png") if os.path.exists("icons/prev.png") else QIcon(), "上一段", self)
+        self.prev_chunk_btn = QAction(self._icon("icons/prev.png"), "上一段", self)
         self.prev_chunk_btn.setStatusTip("加载上一个数据块")
         self.prev_chunk_btn.triggered.connect(self.load_previous_chunk)
         self.prev_chunk_btn.setEnabled(False)  # 初始禁用
         
-        self.next_chunk_btn = QAction(QIcon("icons/next.png") if os.path.exists("icons/next.png") else QIcon(), "下一段", self)
+        self.next_chunk_btn = QAction(self._icon("icons/next.png"), "下一段", self)
         self.next_chunk_btn.setStatusTip("加载下一个数据块")
         self.next_chunk_btn.triggered.connect(self.load_next_chunk)
         self.next_chunk_btn.setEnabled(False)  # 初始禁用
@@ -265,6 +363,15 @@ class SeismicPhasePicker(QMainWindow):
         self.threshold_combo.setCurrentText('0.5')
         toolbar.addWidget(self.threshold_combo)
         
+        # 添加推理批大小选择，0表示根据推理设备自动估算
+        batch_label = QLabel("批大小：")
+        toolbar.addWidget(batch_label)
+        self.batch_spin = QSpinBox()
+        self.batch_spin.setRange(0, 1024)
+        self.batch_spin.setSpecialValueText("自动")
+        self.batch_spin.setValue(0)
+        toolbar.addWidget(self.batch_spin)
+        
         # 添加清除按钮
         clear_btn = QPushButton("清除")
         clear_btn.clicked.connect(self.clear_picks)
@@ -313,6 +420,7 @@ class SeismicPhasePicker(QMainWindow):
         self.figure = Figure(figsize=(16, 16))  # 增大图形尺寸
         self.canvas = FigureCanvas(self.figure)
         self.canvas.setMinimumSize(1200, 600)  # 设置最小尺寸，确保内容不会被缩小
+        self.canvas.mpl_connect('draw_event', self._on_canvas_draw)
         plot_layout.addWidget(self.canvas)
         
         # 将图形容器添加到滚动区域
@@ -327,14 +435,11 @@ class SeismicPhasePicker(QMainWindow):
         streaming_h_layout = QHBoxLayout()
         streaming_layout.addLayout(streaming_h_layout)
         
-        # 创建左侧波形区域
+        # 创建左侧波形区域，滚动波形显示组件在首次切换到该标签页或进入实时模拟时创建
         waveform_container = QWidget()
-        waveform_container_layout = QVBoxLayout(waveform_container)
-        waveform_container_layout.setContentsMargins(0, 0, 0, 0)  # 移除边距
-        
-        # 创建滚动波形显示组件
-        self.scrolling_display = ScrollingWaveformDisplay(window_length=30.0)
-        waveform_container_layout.addWidget(self.scrolling_display)
+        self.waveform_container_layout = QVBoxLayout(waveform_container)
+        self.waveform_container_layout.setContentsMargins(0, 0, 0, 0)  # 移除边距
+        self.scrolling_display = None
         
         # 创建右侧地图区域
         map_container = QWidget()
@@ -354,6 +459,7 @@ class SeismicPhasePicker(QMainWindow):
         # 将标签页添加到标签页控件
         self.tab_widget.addTab(self.waveform_tab, "波形分析")
         self.tab_widget.addTab(self.streaming_tab, "实时监测")
+        self.tab_widget.currentChanged.connect(self.on_tab_changed)
         
         # 添加状态栏、进度条
         status_layout = QHBoxLayout()
@@ -407,14 +513,28 @@ class SeismicPhasePicker(QMainWindow):
             if not filename:
                 return
             
+            # 换了文件时释放之前文件的时间窗口读取缓存
+            if filename != self.current_file:
+                clear_read_cache()
             self.current_file = filename
+            self._head_stream = None
+            self._prefetched_chunks.clear()
+            self._chunk_cache.clear()  # 重新选择文件时分块大小可能变化，块索引不再对应
+            self._prefetch_pending.clear()
+            self._open_generation += 1
             
             # 首先尝试读取文件头，获取时间范围
             try:
                 temp_stream = read(filename, headonly=True)
+                self._head_stream = temp_stream
                 if temp_stream:
-                    start_time = min([tr.stats.starttime for tr in temp_stream])
-                    end_time = max([tr.stats.endtime for tr in temp_stream])
+                    # 用整数纳秒时间戳数组求最早开始和最晚结束时间，避免逐个比较UTCDateTime对象
+                    starts = np.fromiter((tr.stats.starttime.ns for tr in temp_stream),
+                                         dtype=np.int64, count=len(temp_stream))
+                    ends = np.fromiter((tr.stats.endtime.ns for tr in temp_stream),
+                                       dtype=np.int64, count=len(temp_stream))
+                    start_time = UTCDateTime(ns=int(starts.min()))
+                    end_time = UTCDateTime(ns=int(ends.max()))
                     
                     # 保存原始时间范围
                     self.original_start_time = start_time
@@ -438,7 +558,7 @@ class SeismicPhasePicker(QMainWindow):
                             self.chunk_status_label.setText("未使用分块模式")
                             
                             # 在线程中加载波形
-                            self.load_thread = WaveformLoadThread(filename)
+                            load_window = (None, None)
                             
                         elif params['mode'] == 'chunk':
                             # 分块处理模式
@@ -451,6 +571,7 @@ class SeismicPhasePicker(QMainWindow):
                             total_duration = end_time - start_time
                             self.total_chunks = int(np.ceil(total_duration / self.chunk_size))
                             self.current_chunk_index = 0
+                            self._build_chunk_time_strings()
                             
                             # 启用分块导航按钮
                             self.prev_chunk_btn.setEnabled(False)  # 第一块，禁用上一块按钮
@@ -464,21 +585,15 @@ class SeismicPhasePicker(QMainWindow):
                             chunk_end = min(chunk_start + self.chunk_size, end_time)
                             
                             # 在线程中加载波形
-                            self.load_thread = WaveformLoadThread(filename, chunk_start, chunk_end)
-                        
-                        # 连接线程信号
-                        self.load_thread.progressChanged.connect(self.update_progress)
-                        self.load_thread.finished.connect(self.on_waveform_loaded)
-                        self.load_thread.error.connect(self.on_thread_error)
-                        self.load_thread.statusUpdate.connect(self.update_status)
+                            load_window = (chunk_start, chunk_end)
                         
                         # 初始化进度条
                         self.status_label.setText("正在加载波形数据...")
                         self.progress_bar.setValue(0)
                         self.progress_bar.setVisible(True)
                         
-                        # 启动线程
-                        self.load_thread.start()
+                        # 提交加载任务
+                        self.start_load_task(filename, *load_window)
                     else:
                         # 用户取消
                         return
@@ -487,17 +602,14 @@ class SeismicPhasePicker(QMainWindow):
                 # 如果读取头信息失败，回退到常规加载方式
                 self.status_label.setText(f"读取文件头失败: {str(e)}，尝试直接加载...")
                 self.stream = read(filename)
-                self.stream.detrend('linear')
-                
-                # 获取采样率
-                sampling_rate = self.stream[0].stats.sampling_rate
-                nyquist = sampling_rate / 2.0
+                # 读取后立即转换为float32，后续堆叠、滤波和绘图都不再经过float64
+                for tr in self.stream:
+                    tr.data = tr.data.astype(np.float32, copy=False)
                 
-                # 确保高截止频率低于奈奎斯特频率
-                freqmax = min(20.0, nyquist - 0.1)
-                
-                self.stream.filter('bandpass', freqmin=1.0, freqmax=freqmax)
-                self.picks = []
+                # 同采样率同长度的通道整体去趋势和带通滤波
+                self.raw_stream = preprocess_stream(self.stream)
+                self._display_cache = {}
+                self.picks = None
                 self.update_plot()
                 self.status_label.setText(f"已加载波形，共 {len(self.stream)} 个通道")
                 
@@ -507,12 +619,31 @@ class SeismicPhasePicker(QMainWindow):
             traceback.print_exc()
             self.status_label.setText(f"加载波形失败: {str(e)}")
     
-    def on_waveform_loaded(self, stream):
+    def start_load_task(self, filename, start_time=None, end_time=None):
+        """向线程池提交前台波形加载任务，优先于后台预取执行"""
+        self._load_request_id += 1
+        task = WaveformLoadTask(self.load_signals, filename, start_time, end_time,
+                                head_stream=self._head_stream, tag=self._load_request_id)
+        self.load_pool.start(task, 1)
+
+    def on_load_task_finished(self, request_id, stream, raw_stream, plot_payload):
+        """前台加载任务完成，只处理最新一次请求的结果"""
+        if request_id == self._load_request_id:
+            self.on_waveform_loaded(stream, raw_stream, plot_payload)
+
+    def on_load_task_error(self, request_id, error_message):
+        """前台加载任务出错，只报告最新一次请求的错误"""
+        if request_id == self._load_request_id:
+            self.on_thread_error(error_message)
+
+    def on_waveform_loaded(self, stream, raw_stream, plot_payload):
         """波形加载完成后的回调函数"""
         if self.chunk_mode:
-            self.on_chunk_loaded(stream)
+            self.on_chunk_loaded(stream, raw_stream, plot_payload)
         else:
             self.stream = stream
+            self.raw_stream = raw_stream
+            self._set_display_cache(stream, plot_payload)
             self.update_plot()
             self.progress_bar.setVisible(False)
             self.status_label.setText(f"已加载 {len(self.stream)} 个波形通道")
@@ -568,29 +699,86 @@ class SeismicPhasePicker(QMainWindow):
         if not self.current_file:
             return
         
+        # 数据块最近查看过或已预取时直接使用；同时作废仍在进行的前台加载，
+        # 避免其结果到达后被当作当前块显示和缓存
+        cache_key = (self.current_file, self.current_chunk_index)
+        if cache_key in self._chunk_cache:
+            self._load_request_id += 1
+            self._chunk_cache.move_to_end(cache_key)
+            self.on_chunk_loaded(*self._chunk_cache[cache_key])
+            return
+        prefetched = self._prefetched_chunks.pop(self.current_chunk_index, None)
+        if prefetched is not None:
+            self._load_request_id += 1
+            self.on_chunk_loaded(*prefetched)
+            return
+        
         # 显示进度条
         self.status_label.setText(f"正在加载数据块 {self.current_chunk_index + 1}/{self.total_chunks}...")
         self.progress_bar.setValue(0)
         self.progress_bar.setVisible(True)
         
-        # 创建并启动加载线程
-        self.load_thread = WaveformLoadThread(self.current_file, start_time, end_time)
-        self.load_thread.progressChanged.connect(self.update_progress)
-        self.load_thread.finished.connect(self.on_chunk_loaded)
-        self.load_thread.error.connect(self.on_thread_error)
-        self.load_thread.statusUpdate.connect(self.update_status)
-        self.load_thread.start()
+        # 提交加载任务
+        self.start_load_task(self.current_file, start_time, end_time)
 
-    def on_chunk_loaded(self, stream):
+    def on_chunk_loaded(self, stream, raw_stream, plot_payload):
         """数据块加载完成后的回调"""
         self.stream = stream
+        self.raw_stream = raw_stream
+        self._set_display_cache(stream, plot_payload)
+        
+        # 加入数据块缓存，加载后的波形只读使用，无需复制
+        cache_key = (self.current_file, self.current_chunk_index)
+        self._chunk_cache[cache_key] = (stream, raw_stream, plot_payload)
+        self._chunk_cache.move_to_end(cache_key)
+        while len(self._chunk_cache) > self._chunk_cache_size:
+            self._chunk_cache.popitem(last=False)
         
         # 清除之前的相位检测结果，因为它们可能不适用于当前分块
-        self.picks = []
+        self.picks = None
         
         self.update_plot()
         self.progress_bar.setVisible(False)
         self.status_label.setText(f"已加载数据块 {self.current_chunk_index + 1}/{self.total_chunks}，共 {len(self.stream)} 个通道")
+        
+        # 在用户查看当前块时后台预取前后相邻的数据块
+        neighbors = (self.current_chunk_index - 1, self.current_chunk_index + 1)
+        for chunk_index in list(self._prefetched_chunks):
+            if chunk_index not in neighbors:
+                del self._prefetched_chunks[chunk_index]
+        for chunk_index in neighbors:
+            self.prefetch_chunk(chunk_index)
+
+    def prefetch_chunk(self, chunk_index):
+        """在后台线程中加载并预处理指定数据块，结果保存在预取缓存中"""
+        if (not 0 <= chunk_index < self.total_chunks or chunk_index in self._prefetched_chunks
+                or (self.current_file, chunk_index) in self._chunk_cache):
+            return
+        
+        # 同一数据块正在预取时不重复提交
+        tag = (self._open_generation, self.current_file, chunk_index)
+        if tag in self._prefetch_pending:
+            return
+        self._prefetch_pending.add(tag)
+        
+        chunk_start = self.original_start_time + chunk_index * self.chunk_size
+        chunk_end = min(chunk_start + self.chunk_size, self.original_end_time)
+        self.load_pool.start(WaveformLoadTask(self.prefetch_signals, self.current_file, chunk_start, chunk_end,
+                                              head_stream=self._head_stream, tag=tag))
+
+    def on_prefetch_error(self, tag, error_message):
+        """预取失败时忽略，用户实际切换到该块时会重新加载并报告错误"""
+        self._prefetch_pending.discard(tag)
+
+    def on_chunk_prefetched(self, tag, stream, raw_stream, plot_payload):
+        """预取完成后的回调，文件已重新打开或该块不再相邻时丢弃结果"""
+        self._prefetch_pending.discard(tag)
+        generation, filename, chunk_index = tag
+        if generation != self._open_generation or filename != self.current_file or not self.chunk_mode:
+            return
+        if abs(chunk_index - self.current_chunk_index) != 1:
+            return
+        self._prefetched_chunks[chunk_index] = (stream, raw_stream, plot_payload)
 
     def update_chunk_status_label(self):
         """更新分块状态标签"""
@@ -598,17 +786,25 @@ class SeismicPhasePicker(QMainWindow):
             self.chunk_status_label.setText("未使用分块模式")
             return
         
-        # 计算当前块的时间范围
-        chunk_start = self.original_start_time + self.current_chunk_index * self.chunk_size
-        chunk_end = min(chunk_start + self.chunk_size, self.original_end_time)
-        
-        # 格式化时间
-        start_str = chunk_start.strftime("%Y-%m-%d %H:%M:%S")
-        end_str = chunk_end.strftime("%Y-%m-%d %H:%M:%S")
+        # 当前块的时间范围字符串已预先生成
+        start_str, end_str = self._chunk_time_strings[self.current_chunk_index]
         
         # 更新标签
         self.chunk_status_label.setText(f"块 {self.current_chunk_index + 1}/{self.total_chunks}: {start_str} - {end_str}")
     
+    def _build_chunk_time_strings(self):
+        """按固定的分块网格一次性生成所有数据块开始和结束时间的显示字符串"""
+        step_ns = int(round(self.chunk_size * 1e9))
+        chunk_starts = self.original_start_time.ns + np.arange(self.total_chunks, dtype=np.int64) * step_ns
+        chunk_ends = np.minimum(chunk_starts + step_ns, self.original_end_time.ns)
+        
+        # 截断到整秒后批量格式化，与strftime("%Y-%m-%d %H:%M:%S")结果一致
+        def format_seconds(ns):
+            seconds = (ns // 1_000_000_000).astype('datetime64[s]')
+            return np.char.replace(np.datetime_as_string(seconds, unit='s'), 'T', ' ').tolist()
+        
+        self._chunk_time_strings = list(zip(format_seconds(chunk_starts), format_seconds(chunk_ends)))
+    
     def load_inventory(self):
         """加载ObsPy台站目录"""
         try:
@@ -617,12 +813,39 @@ class SeismicPhasePicker(QMainWindow):
                 "台站目录文件 (*.xml *.StationXML);;All Files (*)")
             
             if filename:
-                self.inventory = read_inventory(filename)
+                # 同一台站目录文件之前转换过时，直接读取缓存的台站数据框，跳过解析
+                with open(filename, 'rb') as f:
+                    digest = hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+                cache_dir = _station_cache_dir()
+                cache_file = os.path.join(cache_dir, f"{digest}.npz")
+                if self.associator and os.path.exists(cache_file):
+                    try:
+                        stations_df = _load_station_table(cache_file)
+                    except Exception:
+                        # 缓存文件损坏时删除，改为重新解析台站目录
+                        traceback.print_exc()
+                        with contextlib.suppress(OSError):
+                            os.remove(cache_file)
+                    else:
+                        self.inventory = None
+                        self.stations_df = stations_df
+                        self.status_label.setText(f"台站目录加载成功（缓存），共 {len(self.stations_df)} 个台站")
+                        return
+                
+                # 关联器只需要台站坐标，按通道级别读取，跳过仪器响应的解析和查找
+                self.inventory = read_inventory(filename, level='channel')
                 
                 # 将台站目录转换为数据框
                 if self.associator:
                     self.stations_df = self.associator.inventory_to_df(self.inventory)
                     self.status_label.setText(f"台站目录加载成功，共 {len(self.stations_df)} 个台站")
+                    
+                    # 写入缓存失败不影响本次加载
+                    try:
+                        os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+                        _save_station_table(self.stations_df, cache_file)
+                    except Exception:
+                        traceback.print_exc()
                 else:
                     QMessageBox.warning(self, "警告", "关联器未配置成功，无法处理台站数据")
                 
@@ -642,13 +865,14 @@ class SeismicPhasePicker(QMainWindow):
 
         threshold = float(self.threshold_combo.currentText())
         
-        # 创建并配置线程，支持分块处理
+        # 创建并配置线程，支持分块处理；模型使用未经带通滤波的波形
         self.phase_thread = PhaseDetectionThread(
             model=self.model, 
-            stream=self.stream, 
+            stream=self.raw_stream if self.raw_stream is not None else self.stream, 
             threshold=threshold,
             chunk_mode=self.chunk_mode,
-            chunk_size=self.chunk_size
+            chunk_size=self.chunk_size,
+            batch_size=self.batch_spin.value() or None
         )
         
         # 连接信号
@@ -673,13 +897,16 @@ class SeismicPhasePicker(QMainWindow):
             current_chunk_end = min(current_chunk_start + self.chunk_size, self.original_end_time)
             
             # 过滤相位，只保留当前分块内的
-            self.picks = [pick for pick in picks if current_chunk_start <= pick['time'] <= current_chunk_end]
+            times = picks['time'].to_numpy()
+            in_chunk = (times >= current_chunk_start.timestamp) & (times <= current_chunk_end.timestamp)
+            self.picks = picks[in_chunk].reset_index(drop=True)
             self.status_label.setText(f"在当前分块中找到 {len(self.picks)} 个相位到达")
         else:
             self.picks = picks
             self.status_label.setText(f"找到 {len(self.picks)} 个相位到达")
         
-        self.update_plot()
+        self._index_picks()
+        self._refresh_plot()
         self.progress_bar.setVisible(False)
     
     def associate_events(self):
@@ -693,7 +920,7 @@ class SeismicPhasePicker(QMainWindow):
             QMessageBox.warning(self, "警告", "\n".join(msg))
             return
         
-        if not self.picks:
+        if self.picks is None or self.picks.empty:
             QMessageBox.warning(self, "警告", "没有检测到相位，请先进行相位检测")
             return
             
@@ -763,25 +990,233 @@ class SeismicPhasePicker(QMainWindow):
         
     def clear_picks(self):
         """清除所有检测结果"""
-        self.picks = []
-        self.update_plot()
+        self.picks = None
+        self._refresh_plot()
         self.status_label.setText("已清除所有相位检测结果")
 
     def update_plot(self):
         """使用当前波形和检测结果更新图形"""
-        self.figure.clear()
-        
         if not self.stream:
             # 显示空图和提示信息
+            self.figure.clear()
+            self._plot_key = None
+            self._trace_axes = []
+            self._trace_lines = []
+            self._overlay_artists = []
+            self._background = None
+            self._display_cache = {}
+            self._ylim_cache = []
             ax = self.figure.add_subplot(111)
             ax.text(0.5, 0.5, 'Load waveform data to begin',
                     ha='center', va='center', fontsize=18)
             ax.set_xticks([])
             ax.set_yticks([])
+            self.canvas.draw_idle()
+            return
+        
+        # 计算时间偏移量，用于分块模式下的连续时间轴显示
+        time_offset = 0
+        if self.chunk_mode and self.current_chunk_index > 0:
+            time_offset = self.current_chunk_index * self.chunk_size
+        
+        # 通道布局变化时重建子图，否则复用已有子图和曲线
+        plot_key = (tuple(trace.id for trace in self.stream), self.chunk_mode)
+        if plot_key != self._plot_key:
+            # 重建子图会修改画布和容器的最小尺寸，布局全部完成后再重绘
+            with _updates_suspended(self.plot_widget):
+                self._build_plot(plot_key)
         else:
-            # 绘制每个波形
-            num_traces = len(self.stream)
+            for artist in self._overlay_artists:
+                artist.remove()
+        self._overlay_artists = []
+        
+        for ax, line, trace in zip(self._trace_axes, self._trace_lines, self.stream):
+            # 在分块模式下调整时间轴，使其显示连续的时间
+            line.set_data(*self._display_arrays(trace, time_offset))
+            ax.set_autoscale_on(True)
+            ax.relim()
+            ax.autoscale_view()
+        
+        # 确定坐标范围后固定，标记变化时不再重新计算
+        self._ylim_cache = [ax.get_ylim()[1] for ax in self._trace_axes]
+        for ax in self._trace_axes:
+            ax.set_autoscale_on(False)
+        self._plotted_stream = self.stream
+        self._background = None
+        
+        self._draw_picks()
+        
+        # 合并到事件循环中统一重绘，绘制完成后在_on_canvas_draw中缓存背景并绘制标记
+        self.canvas.draw_idle()
+
+    def _set_display_cache(self, stream, plot_payload):
+        """用加载线程中预先降采样的绘图数据替换显示缓存，GUI线程不再处理完整波形"""
+        self._display_cache = {trace.id: (trace.data,) + plot_payload[trace.id]
+                               for trace in stream if trace.id in plot_payload}
+
+    def _display_arrays(self, trace, time_offset):
+        """返回通道用于显示的时间轴和float32数据（按像素最小/最大值降采样），同一数据只降采样一次"""
+        cached = self._display_cache.get(trace.id)
+        if cached is None or cached[0] is not trace.data:
+            times, data = minmax_downsample(trace.times(), trace.data.astype(np.float32, copy=False))
+            cached = (trace.data, times, data)
+            self._display_cache[trace.id] = cached
+        return cached[1] + time_offset, cached[2]
+
+    def _refresh_plot(self):
+        """仅更新相位标记：波形未变时恢复背景缓存并blit，否则完整重绘"""
+        self._rebuild_overlays()
+        self._blit_overlays()
+
+    def _rebuild_overlays(self):
+        """波形未变时移除旧标记并重新生成相位标记，不触发完整绘制；波形变化时完整重绘"""
+        if self._plotted_stream is not self.stream or not self._trace_axes:
+            self.update_plot()
+            return
+        
+        for artist in self._overlay_artists:
+            artist.remove()
+        self._overlay_artists = []
+        self._draw_picks()
+
+    def _on_canvas_draw(self, event):
+        """画布完整绘制（含窗口缩放）后缓存不含标记的背景，并在其上绘制标记"""
+        if not self._trace_axes or self._exporting or event.canvas.is_saving():
+            return
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        for artist in self._overlay_artists:
+            artist.axes.draw_artist(artist)
+
+    def _blit_overlays(self):
+        """在背景缓存上重绘所有标记并blit到屏幕；背景尚未生成时由即将进行的完整绘制负责"""
+        if self._background is None:
+            return
+        self.canvas.restore_region(self._background)
+        for artist in self._overlay_artists:
+            artist.axes.draw_artist(artist)
+        self.canvas.blit(self.figure.bbox)
+
+    def _channel_key(self, trace):
+        """返回波形通道对应的相位表通道ID（台网.台站），每个通道只计算一次"""
+        key = self._trace_channel_key.get(trace.id)
+        if key is None:
+            key = self._trace_channel_key[trace.id] = '.'.join(trace.id.split('.', 2)[:2])
+        return key
+
+    def _index_picks(self):
+        """缓存相位表各列的numpy数组，并按通道ID分组记录行索引，重绘时直接取各通道的相位"""
+        self._pick_columns = {
+            'by_channel': self.picks.groupby('channel', sort=False).indices,
+            'time': self.picks['time'].to_numpy(),
+            'phase': self.picks['phase'].to_numpy(),
+            'probability': self.picks['probability'].to_numpy(),
+        }
+
+    def _draw_picks(self):
+        """为每个通道添加相位检测结果标记"""
+        if self.picks is None:
+            return
+        
+        # 计算时间偏移量，用于分块模式下的连续时间轴显示
+        time_offset = 0
+        if self.chunk_mode and self.current_chunk_index > 0:
+            time_offset = self.current_chunk_index * self.chunk_size
+        
+        columns = self._pick_columns
+        for ax, ylim_top, trace in zip(self._trace_axes, self._ylim_cache, self.stream):
+            # 对每个通道的检测结果显示
+            rows = columns['by_channel'].get(self._channel_key(trace))
+            if rows is None:
+                continue
+            y_position = ylim_top * 0.8
             
+            # 计算相对于当前分块的时间，该通道所有相位线合并为一个图元
+            pick_times = columns['time'][rows] - trace.stats.starttime.timestamp + time_offset
+            phases = columns['phase'][rows]
+            colors = np.where(phases == 'P', 'red', 'blue').tolist()
+            self._add_vlines(ax, pick_times, colors, linestyles='--', alpha=0.7, linewidths=1.5)
+            
+            for pick_time, phase, color, probability in zip(pick_times, phases, colors,
+                                                            columns['probability'][rows]):
+                self._overlay_artists.append(
+                    ax.text(pick_time + 0.5, y_position+3,
+                            f"{phase}\n{probability:.2f}",
+                            color=color, va='top', fontsize=12, 
+                            bbox=dict(facecolor='white', alpha=0.7, pad=2), animated=True))
+
+    def _index_events(self):
+        """提取落在所有波形总时间范围内的事件各列numpy数组，关联相位按(台站, 事件)分组记录行号；
+        没有事件落在范围内时返回(None, None)"""
+        # 先用所有波形的总时间范围整体筛选事件，范围外的事件不再进入逐波形循环
+        global_start = min(tr.stats.starttime.timestamp for tr in self.stream)
+        global_end = max(tr.stats.endtime.timestamp for tr in self.stream)
+        event_times = self.events_df['time'].to_numpy()
+        visible = np.flatnonzero((event_times >= global_start) & (event_times <= global_end))
+        if len(visible) == 0:
+            return None, None
+        
+        events = {
+            'time': event_times[visible],
+            'latitude': self.events_df['latitude'].to_numpy()[visible],
+            'longitude': self.events_df['longitude'].to_numpy()[visible],
+            'depth': self.events_df['depth'].to_numpy()[visible],
+            'label': self.events_df.index.to_numpy()[visible],  # 与关联相位的event_idx对应
+            'number': visible + 1,  # 事件在完整目录中的序号，用于标签
+        }
+        if self.assignments_df is None:
+            return events, None
+        assigned = {
+            'by_station_event': self.assignments_df.groupby(['station', 'event_idx'], sort=False).indices,
+            'time': self.assignments_df['time'].to_numpy(),
+            'phase': self.assignments_df['phase'].to_numpy(),
+            'residual': self.assignments_df['residual'].to_numpy(),
+        }
+        return events, assigned
+
+    @staticmethod
+    def _build_event_marker_arrays(events, trace_start, trace_end):
+        """返回波形时间范围内事件的(序号, 相对波形起点的时间, 标签文本)"""
+        rel = events['time'] - trace_start
+        positions = np.flatnonzero((rel >= 0) & (rel <= trace_end - trace_start))
+        texts = [f"Event {events['number'][j]}\nLat: {events['latitude'][j]:.2f}\nLon: {events['longitude'][j]:.2f}\n"
+                 f"Depth: {events['depth'][j]:.2f}km" for j in positions]
+        return positions, rel[positions], texts
+
+    @staticmethod
+    def _build_pick_marker_arrays(assigned, rows, trace_start, trace_end):
+        """返回指定关联相位中位于波形时间范围内的(相对时间, 颜色, 标签文本)"""
+        rel = assigned['time'][rows] - trace_start
+        keep = (rel >= 0) & (rel <= trace_end - trace_start)
+        rows = rows[keep]
+        phases = assigned['phase'][rows]
+        colors = np.where(phases == 'S', 'blue', 'red').tolist()
+        texts = [f"{phase} ({residual:.2f}s)" for phase, residual in zip(phases, assigned['residual'][rows])]
+        return rel[keep], colors, texts
+
+    def _add_vlines(self, ax, xs, colors, **kwargs):
+        """用一个LineCollection绘制一组贯穿子图高度的竖线（效果同axvline），加入标记层"""
+        if len(xs) == 0:
+            return
+        segments = np.empty((len(xs), 2, 2))
+        segments[:, :, 0] = np.asarray(xs)[:, np.newaxis]
+        segments[:, 0, 1] = 0
+        segments[:, 1, 1] = 1
+        collection = LineCollection(segments, colors=colors, transform=ax.get_xaxis_transform(),
+                                    animated=True, **kwargs)
+        self._overlay_artists.append(ax.add_collection(collection, autolim=False))
+
+    def _build_plot(self, plot_key):
+        """按当前通道布局重建子图、坐标轴标签和波形曲线"""
+        self.figure.clear()
+        self._plot_key = plot_key
+        self._trace_axes = []
+        self._trace_lines = []
+        
+        # 绘制每个波形
+        num_traces = len(self.stream)
+        
+        # 只有通道数变化时才重新计算图形高度和控件最小尺寸
+        if self._layout_state is None or self._layout_state[0] != num_traces:
             # 调整高度计算，添加额外的底部空间保证最后一个波形可以完全显示
             fixed_height = max(12, num_traces * 3 + 2)  # 增加总高度并添加额外空间
             self.figure.set_figheight(fixed_height)
@@ -792,72 +1227,39 @@ class SeismicPhasePicker(QMainWindow):
             # 确保plot_widget有更多的高度
             self.plot_widget.setMinimumHeight(fixed_height * 100 + 100)  # 添加额外100像素
             
-            # 为每个子图保留足够的垂直空间，减小比例以留出更多空间
-            subplot_height = 0.85 / num_traces if num_traces > 1 else 0.85
+            # 确保滚动区域更新
+            self.plot_widget.updateGeometry()
+            self.plot_widget.setMinimumSize(self.plot_widget.sizeHint())
+            self._layout_state = (num_traces, fixed_height)
+        
+        for i, trace in enumerate(self.stream):
+            ax = self.figure.add_subplot(num_traces, 1, i+1)
             
-            # 计算时间偏移量，用于分块模式下的连续时间轴显示
-            time_offset = 0
-            if self.chunk_mode and self.current_chunk_index > 0:
-                time_offset = self.current_chunk_index * self.chunk_size
+            # 创建波形曲线，数据在update_plot中填充
+            line, = ax.plot([], [], 'k', linewidth=1.0)
+            self._trace_axes.append(ax)
+            self._trace_lines.append(line)
             
-            for i, trace in enumerate(self.stream):
-                ax = self.figure.add_subplot(num_traces, 1, i+1)
-                
-                # 绘制波形
-                times = trace.times()
-                
-                # 在分块模式下调整时间轴，使其显示连续的时间
+            # 设置标签和坐标轴文字大小
+            ax.set_ylabel(trace.id, fontsize=12)
+            if i == num_traces-1:
                 if self.chunk_mode:
-                    times = times + time_offset
-                
-                ax.plot(times, trace.data, 'k', linewidth=1.0)
-                
-                # 对每个通道的检测结果显示
-                channel_picks = [p for p in self.picks if p['channel'] == '.'.join(trace.id.split('.', 2)[:2])]
-                for pick in channel_picks:
-                    # 计算相对于当前分块的时间
-                    if self.chunk_mode:
-                        # 只显示当前分块内的相位
-                        pick_time_relative = pick['time'] - trace.stats.starttime
-                        pick_time = pick_time_relative + time_offset
-                    else:
-                        pick_time = pick['time'] - trace.stats.starttime
-                    
-                    color = 'red' if pick['phase'] == 'P' else 'blue'
-                    ax.axvline(pick_time, color=color, linestyle='--', alpha=0.7, linewidth=1.5)
-                    y_position = ax.get_ylim()[1] * 0.8
-                    ax.text(pick_time + 0.5, y_position+3,
-                            f"{pick['phase']}\n{pick['probability']:.2f}",
-                            color=color, va='top', fontsize=12, 
-                            bbox=dict(facecolor='white', alpha=0.7, pad=2))
-                
-                # 设置标签和坐标轴文字大小
-                ax.set_ylabel(trace.id, fontsize=12)
-                if i == num_traces-1:
-                    if self.chunk_mode:
-                        ax.set_xlabel('Time (s) - Continuous', fontsize=12)
-                    else:
-                        ax.set_xlabel('Time (s)', fontsize=12)
-                    # 为最后一个子图增加底部边距
-                    plt_pos = ax.get_position()
-                    ax.set_position([plt_pos.x0, plt_pos.y0, plt_pos.width, plt_pos.height - 0.02])
-                
-                # 设置刻度标签字体
-                for label in ax.get_xticklabels():
-                    label.set_fontsize(10)
-                for label in ax.get_yticklabels():
-                    label.set_fontsize(10)
-                
-                ax.grid(True, alpha=0.3)
-        
-            # 调整布局，增加底部空间
+                    ax.set_xlabel('Time (s) - Continuous', fontsize=12)
+                else:
+                    ax.set_xlabel('Time (s)', fontsize=12)
+            
+            # 设置刻度标签字体
+            ax.tick_params(labelsize=10)
+            ax.grid(True, alpha=0.3)
+        
+        # 调整布局，增加底部空间；同样的通道数和图形尺寸只计算一次，之后直接套用边距
+        layout_key = (num_traces, self.chunk_mode, tuple(self.figure.get_size_inches()))
+        params = self._subplot_params.get(layout_key)
+        if params is None:
             self.figure.tight_layout(pad=3.0, h_pad=2.0, rect=[0, 0.02, 1, 0.98])
-    
-        self.canvas.draw()
-        
-        # 确保滚动区域更新
-        self.plot_widget.updateGeometry()
-        self.plot_widget.setMinimumSize(self.plot_widget.sizeHint())
+            self._subplot_params[layout_key] = _subplot_params(self.figure)
+        else:
+            self.figure.subplots_adjust(**params)
 
     def export_image(self):
         """导出当前图像"""
@@ -865,29 +1267,78 @@ class SeismicPhasePicker(QMainWindow):
         file_name, _ = QFileDialog.getSaveFileName(self, "Save Image", "", 
                                                    "PNG Files (*.png);;JPG Files (*.jpg);;All Files (*)", 
                                                    options=options)
-        if file_name:
-            self.figure.savefig(file_name)
-            self.status_label.setText(f"图像已保存为 {file_name}")
+        if not file_name:
+            return
+        
+        # 与savefig一致，未指定扩展名时保存为PNG
+        ext = os.path.splitext(file_name)[1].lower()
+        if not ext:
+            file_name += '.png'
+            ext = '.png'
+        
+        # 标记为animated，常规绘制时不包含，保存时临时取消以便写入图片
+        for artist in self._overlay_artists:
+            artist.set_animated(False)
+        try:
+            if ext not in ('.png', '.jpg', '.jpeg'):
+                # 矢量等其他格式直接由Matplotlib保存
+                self.figure.savefig(file_name)
+                self.status_label.setText(f"图像已保存为 {file_name}")
+                return
+            
+            # 界面线程只栅格化为未压缩的RGBA数据，编码和写文件交给线程池；
+            # 与savefig一样按原始DPI（不含高分屏缩放）渲染，图像宽高取Agg渲染器实际输出的尺寸
+            screen_dpi = self.figure.dpi
+            self._exporting = True
+            self.figure.set_dpi(getattr(self.figure, '_original_dpi', screen_dpi))
+            try:
+                rgba, size = self.canvas.print_to_buffer()
+            finally:
+                self.figure.set_dpi(screen_dpi)
+                self._exporting = False
+        finally:
+            for artist in self._overlay_artists:
+                artist.set_animated(True)
+        
+        # 画布的渲染器此时为导出尺寸，重新绘制屏幕图像和背景缓存
+        self.canvas.draw_idle()
+        
+        self.status_label.setText(f"正在保存图像 {file_name}...")
+        self.export_pool.start(ImageExportTask(self.export_signals, rgba, size, file_name))
+
+    def on_image_exported(self, file_name):
+        """图像导出任务完成"""
+        self.status_label.setText(f"图像已保存为 {file_name}")
+
+    def on_image_export_error(self, error_message):
+        """图像导出任务出错"""
+        QMessageBox.warning(self, "导出错误", f"保存图像失败: {error_message}")
+        self.status_label.setText(f"保存图像失败: {error_message}")
 
     def export_report(self):
         """导出检测报告"""
-        if not self.picks:
+        if self.picks is None or self.picks.empty:
             QMessageBox.warning(self, "警告", "没有检测结果可导出")
             return
             
-        report_content = "Seismic Phase Detection Report\n\n"
-        report_content += f"Number of Picks: {len(self.picks)}\n"
-        report_content += "Picks Details:\n"
-        for pick in self.picks:
-            report_content += f"Time: {pick['time']}, Phase: {pick['phase']}, Channel: {pick['channel']}, Probability: {pick['probability']:.2f}\n"
+        # 逐行收集报告内容后一次写出，避免字符串反复拼接
+        report_lines = ["Seismic Phase Detection Report\n\n",
+                        f"Number of Picks: {len(self.picks)}\n",
+                        "Picks Details:\n"]
+        report_lines.extend(
+            f"Time: {UTCDateTime(time)}, Phase: {phase}, Channel: {channel}, Probability: {probability:.2f}\n"
+            for time, phase, channel, probability in zip(self.picks['time'].to_numpy(),
+                                                         self.picks['phase'].to_numpy(),
+                                                         self.picks['channel'].to_numpy(),
+                                                         self.picks['probability'].to_numpy()))
         
         options = QFileDialog.Options()
         file_name, _ = QFileDialog.getSaveFileName(self, "Save Report", "", 
                                                    "Text Files (*.txt);;All Files (*)", 
                                                    options=options)
         if file_name:
-            with open(file_name, 'w') as report_file:
-                report_file.write(report_content)
+            with open(file_name, 'w', buffering=1 << 20) as report_file:
+                report_file.writelines(report_lines)
             self.status_label.setText(f"报告已保存为 {file_name}")
 
     def show_help(self):
@@ -902,60 +1353,73 @@ class SeismicPhasePicker(QMainWindow):
 
     def update_plot_with_events(self):
         """更新图表，显示关联的事件"""
-        # 现有的绘图代码基础上添加关联事件的标记
-        self.update_plot()
+        # 在相位标记基础上添加关联事件的标记，波形未变时只blit标记层
+        self._rebuild_overlays()
         
         if self.events_df is None or self.events_df.empty:
             print("没有关联事件可显示")
+            self._blit_overlays()
             return
         
-        # 在每个波形上标记事件
-        for i, trace in enumerate(self.stream):
-            ax = self.figure.axes[i]
+        events, assigned = self._index_events()
+        if events is None:
+            # 没有事件落在波形时间范围内，无需逐波形检查
+            self._blit_overlays()
+            return
+        
+        # 关联相位按(台站, 事件)一次字典查找取得行号，不再逐事件筛选关联表
+        picks_by_station_event = assigned['by_station_event'].get if assigned is not None else None
+        labels = events['label']
+        
+        # 在每个波形上标记事件：先按列计算标记数据，再批量绘制
+        for ax, ylim_top, trace in zip(self._trace_axes, self._ylim_cache, self.stream):
+            trace_start = trace.stats.starttime.timestamp
+            trace_end = trace.stats.endtime.timestamp
             
-            # 为每个事件添加垂直线和标签
-            for j, (idx, event) in enumerate(self.events_df.iterrows()):
-                # 获取事件时间
-                event_time = datetime.fromtimestamp(event['time'])
-                event_time_rel = (event_time - trace.stats.starttime.datetime).total_seconds()
-                
-                # 确保事件时间在波形范围内
-                if 0 <= event_time_rel <= trace.stats.endtime - trace.stats.starttime:
-                    # 绘制事件线
-                    ax.axvline(event_time_rel, color='green', linestyle='-', alpha=0.5, linewidth=2.0)
-                    
-                    # 添加事件标签
-                    y_pos = ax.get_ylim()[1] * 0.9
-                    ax.text(event_time_rel + 0.2, y_pos, 
-                            f"Event {j+1}\nLat: {event['latitude']:.2f}\nLon: {event['longitude']:.2f}\nDepth: {event['depth']:.2f}km",
+            # 事件线合并为一个图元，每个事件一个标签
+            positions, event_rel, event_texts = self._build_event_marker_arrays(events, trace_start, trace_end)
+            self._add_vlines(ax, event_rel, 'green', linestyles='-', alpha=0.5, linewidths=2.0)
+            y_pos = ylim_top * 0.9
+            for event_time_rel, text in zip(event_rel, event_texts):
+                self._overlay_artists.append(
+                    ax.text(event_time_rel + 0.2, y_pos, text,
                             color='green', fontsize=10, 
-                            bbox=dict(facecolor='white', alpha=0.7, pad=2))
-                    
-                    # 为该事件相关的相位添加标记
-                    if self.assignments_df is not None:
-                        event_picks = self.assignments_df[self.assignments_df['event_idx'] == idx]
-                        for _, pick in event_picks.iterrows():
-                            if pick['station'] == '.'.join(trace.id.split('.', 2)[:2]):
-                                pick_time = datetime.fromtimestamp(pick['time'])
-                                pick_time_rel = (pick_time - trace.stats.starttime.datetime).total_seconds()
-                                if 0 <= pick_time_rel <= trace.stats.endtime - trace.stats.starttime:
-                                    color = 'blue' if pick['phase'] == 'S' else 'red'
-                                    ax.axvline(pick_time_rel, color=color, linestyle=':', linewidth=1.5)
-                                    y_pos_pick = ax.get_ylim()[1] * 0.7
-                                    ax.text(pick_time_rel + 0.2, y_pos_pick, 
-                                            f"{pick['phase']} ({pick['residual']:.2f}s)",
-                                            color=color, fontsize=8, 
-                                            bbox=dict(facecolor='white', alpha=0.5, pad=1))
-        
-        self.canvas.draw()
+                            bbox=dict(facecolor='white', alpha=0.7, pad=2), animated=True))
+            
+            # 为范围内事件在该台站关联的相位添加标记
+            if assigned is None:
+                continue
+            station_key = self._channel_key(trace)
+            rows = [picks_by_station_event((station_key, labels[j])) for j in positions]
+            rows = [r for r in rows if r is not None]
+            if not rows:
+                continue
+            pick_rel, colors, pick_texts = self._build_pick_marker_arrays(
+                assigned, np.concatenate(rows), trace_start, trace_end)
+            self._add_vlines(ax, pick_rel, colors, linestyles=':', linewidths=1.5)
+            y_pos_pick = ylim_top * 0.7
+            for pick_time_rel, color, text in zip(pick_rel, colors, pick_texts):
+                self._overlay_artists.append(
+                    ax.text(pick_time_rel + 0.2, y_pos_pick, text,
+                            color=color, fontsize=8, 
+                            bbox=dict(facecolor='white', alpha=0.5, pad=1), animated=True))
+        
+        self._blit_overlays()
 
     def visualize_catalog(self):
         """可视化关联的地震目录 - 调用外部模块"""
+        # 按需导入地震目录可视化模块，加快程序启动
+        from catalog_visualizer import CatalogVisualizer
+        
+        if self._catalog_figure is None:
+            self._catalog_figure = Figure()
+        
         CatalogVisualizer.show_catalog_visualization(
             parent=self,
             events_df=self.events_df,
             stations_df=self.stations_df,
-            associator=self.associator
+            associator=self.associator,
+            figure=self._catalog_figure
         )
         
     def show_map_visualization(self):
@@ -1019,49 +1483,59 @@ class SeismicPhasePicker(QMainWindow):
             selected_indices = self.show_channel_selection_dialog()
             if not selected_indices:  # 用户取消了选择
                 return
-            
-            # 创建包含所选通道的子流
-            selected_stream = self.stream.copy()
-            selected_stream.clear()
-            for idx in selected_indices:
-                if 0 <= idx < len(self.stream):
-                    selected_stream += self.stream[idx]
         else:
             # 通道少于等于3个，直接全部显示
-            selected_stream = self.stream.copy()
+            selected_indices = range(len(self.stream))
+        
+        # 数据预处理，确保波形数据质量；预处理结果写入新数组，不影响主界面的波形
+        selected_stream = Stream()
+        for idx in selected_indices:
+            if not 0 <= idx < len(self.stream):
+                continue
+            tr = self.stream[idx]
             
-        # 数据预处理，确保波形数据质量
-        for tr in selected_stream:
-            # 移除均值和线性趋势（改善显示效果）
-            tr.detrend('demean')
-            tr.detrend('linear')
+            # 移除均值和线性趋势（改善显示效果），同时得到最大振幅
+            data, max_amp = detrend_maxabs(tr.data)
             
             # 如果波形振幅异常（太小或太大），则进行归一化
-            max_amp = np.max(np.abs(tr.data))
-            if max_amp < 0.001 or max_amp > 1000:
-                tr.data = tr.data / max_amp  # 归一化
+            if 0 < max_amp < 0.001 or max_amp > 1000:
+                data /= max_amp  # 归一化
+            selected_stream.append(Trace(data=data, header=tr.stats.copy()))
         
         # 切换到实时监测标签页
         self.tab_widget.setCurrentIndex(1)  # 实时监测是第二个标签页
         
-        # 重置滚动波形显示并设置波形数据
-        self.scrolling_display.set_stream(selected_stream)
+        self._ensure_scrolling_display()
         
-        # 如果有相位检测结果，传递给滚动波形显示组件
-        if self.picks:
-            self.scrolling_display.set_picks(self.picks)
-            self.status_label.setText(f"实时监测模式已激活 (显示{len(selected_stream)}个通道，包含{len(self.picks)}个相位标记)")
-        else:
-            self.status_label.setText(f"实时监测模式已激活 (显示{len(selected_stream)}个通道)")
-        
-        # 自动启动滚动播放
-        self.scrolling_display.start_streaming()
-        
-        # 更新状态
-        self.status_label.setText(f"实时监测模式已激活 (显示{len(selected_stream)}个通道)")
+        # 设置波形、相位和启动播放期间暂停滚动显示的重绘，避免中间状态各绘制一次
+        with _updates_suspended(self.scrolling_display):
+            # 重置滚动波形显示并设置波形数据
+            self.scrolling_display.set_stream(selected_stream)
+            
+            # 如果有相位检测结果，传递给滚动波形显示组件
+            if self.picks is not None and not self.picks.empty:
+                self.scrolling_display.set_picks(self.picks)
+                self.status_label.setText(f"实时监测模式已激活 (显示{len(selected_stream)}个通道，包含{len(self.picks)}个相位标记)")
+            else:
+                self.status_label.setText(f"实时监测模式已激活 (显示{len(selected_stream)}个通道)")
+            
+            # 自动启动滚动播放
+            self.scrolling_display.start_streaming()
         
-        # 强制窗口重绘
-        self.repaint()
+        # 请求窗口重绘，由事件循环与其他待处理的绘制合并
+        self.update()
+
+    def on_tab_changed(self, index):
+        """切换到实时监测标签页时创建滚动波形显示组件"""
+        if self.tab_widget.widget(index) is self.streaming_tab:
+            self._ensure_scrolling_display()
+
+    def _ensure_scrolling_display(self):
+        """首次使用时导入并创建滚动波形显示组件，加快程序启动"""
+        if self.scrolling_display is None:
+            from scrolling_waveform import ScrollingWaveformDisplay
+            self.scrolling_display = ScrollingWaveformDisplay(window_length=30.0)
+            self.waveform_container_layout.addWidget(self.scrolling_display)
 
     def show_channel_selection_dialog(self):
         """显示通道选择对话框，允许用户选择要显示的通道"""